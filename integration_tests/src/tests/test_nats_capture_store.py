@@ -0,0 +1,55 @@
+"""
+test for:
+RingCaptureStore with NatsQA
+CapturedMsg records
+"""
+import asyncio
+from google.protobuf.reflection import ParseMessage
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import logger, subjects, nats_connect_string
+from nats_contractor.capture_store import RingCaptureStore, DROP_NEWEST
+from nats_contractor.captured_msg import CapturedMsg
+from nats_contractor.nats import NatsQA
+
+
+def test_ring_capture_store_drop_oldest():
+    nats = NatsQA(logger, subjects, nats_connect_string, capture_store=RingCaptureStore(max_msgs=2))
+    loop = nats.loop = asyncio.get_event_loop()
+    nats_resp = loop.run_until_complete(_test_send(nats))
+    assert [ParseMessage(SimpleMessage.DESCRIPTOR, msg).Body for msg in nats_resp["test_topic1"]] == [b'3', b'4']
+    assert nats_resp["test_topic2"] == []
+    assert nats.capture_store.evicted["test_topic1"] == 3
+    assert nats.total_msg == 5
+
+
+def test_ring_capture_store_drop_newest():
+    nats = NatsQA(logger, subjects, nats_connect_string, capture_store=RingCaptureStore(max_msgs=2, policy=DROP_NEWEST))
+    loop = nats.loop = asyncio.get_event_loop()
+    nats_resp = loop.run_until_complete(_test_send(nats))
+    assert [ParseMessage(SimpleMessage.DESCRIPTOR, msg).Body for msg in nats_resp["test_topic1"]] == [b'0', b'1']
+    assert nats.capture_store.dropped["test_topic1"] == 3
+
+
+def test_capture_records():
+    nats = NatsQA(logger, subjects, nats_connect_string, capture_records=True)
+    loop = nats.loop = asyncio.get_event_loop()
+    nats_resp = loop.run_until_complete(_test_send(nats))
+    records = nats_resp["test_topic1"]
+    assert all(isinstance(record, CapturedMsg) for record in records)
+    assert [record.subject for record in records] == ["test_topic1"] * 5
+    assert ParseMessage(SimpleMessage.DESCRIPTOR, bytes(records[0].payload)).Body == b'0'
+    assert records[0].arrival_ns <= records[-1].arrival_ns
+
+
+async def _test_send(nats):
+    protos = []
+    for i in range(5):
+        proto = SimpleMessage()
+        proto.Body = str(i).encode()
+        protos.append(proto)
+
+    await nats.start_listen_all()
+    await nats.send_many(subjects[0], protos)
+    nats_resp = await nats.wait_msgs(msgs_await=5)
+    await nats.close_pool()
+    return nats_resp
@@ -0,0 +1,76 @@
+"""
+test for:
+register_codec with compression
+codec_stats
+"""
+import asyncio
+import pytest
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import logger, nats_connect_string
+from nats_contractor.nats import NatsQA
+
+
+def test_json_codec_zlib():
+    nats = NatsQA(logger, ["codec.json"], nats_connect_string)
+    nats.register_codec("codec.*", codec="json", compression="zlib", compress_threshold=64)
+    loop = nats.loop = asyncio.get_event_loop()
+    nats_resp = loop.run_until_complete(_test_send(nats, "codec.json", [{"id": 1, "body": "x" * 1000}, {"id": 2}]))
+    assert len(nats_resp["codec.json"][0]) < 100
+    assert list(nats.decoded("codec.json")) == [{"id": 1, "body": "x" * 1000}, {"id": 2}]
+    stats = nats.codec_stats()["codec.*"]
+    assert stats["encoded"] == 2 and stats["compressed"] == 1 and stats["decoded"] == 2
+    assert stats["ratio"] < 0.5
+
+
+def test_protobuf_codec_zlib():
+    nats = NatsQA(logger, ["codec.proto"], nats_connect_string)
+    nats.register_codec("codec.proto", proto_class=SimpleMessage, compression="zlib", compress_threshold=64)
+    loop = nats.loop = asyncio.get_event_loop()
+    loop.run_until_complete(_test_send(nats, "codec.proto", [SimpleMessage(ID=1, Body=b'y' * 1000)]))
+    assert nats.find("codec.proto", ID=1)[0].Body == b'y' * 1000
+
+
+async def _test_send(nats, topic, messages):
+    await nats.start_listen_all()
+    await nats.send_many(topic, messages)
+    nats_resp = await nats.wait_msgs(msgs_await=len(messages))
+    await nats.close_pool()
+    return nats_resp
+
+
+def test_protobuf_codec_without_class():
+    nats = NatsQA(logger, ["codec.proto"], nats_connect_string)
+    with pytest.raises(ValueError):
+        nats.register_codec("codec.proto")
+    nats.register_proto("codec.*", SimpleMessage)
+    assert nats.register_codec("codec.proto").codec.proto_class is SimpleMessage
+
+
+def test_register_codec_again():
+    nats = NatsQA(logger, ["codec.json"], nats_connect_string)
+    nats.register_codec("codec.*", codec="json")
+    pipeline = nats.register_codec("codec.*", codec="json", compression="zlib", compress_threshold=0)
+    assert nats.proto_class("codec.json") is pipeline
+    payload = nats._payload({"id": 1}, "codec.json")
+    assert pipeline.decode(payload) == {"id": 1}
+    assert nats.codec_stats()["codec.*"]["encoded"] == 1
+    assert nats.codec_stats()["codec.*"]["compressed"] == 1
+
+
+def json_handler(request):
+    return {"echo": request["id"]}
+
+
+def test_responder_json_codec():
+    nats = NatsQA(logger, [], nats_connect_string)
+    nats.register_codec("codec.echo", codec="json", compression="zlib", compress_threshold=64)
+    loop = nats.loop = asyncio.get_event_loop()
+    response = loop.run_until_complete(_test_respond(nats))
+    assert nats.proto_class("codec.echo").FromString(response) == {"echo": 7}
+
+
+async def _test_respond(nats):
+    await nats.start_listen_with_respond("codec.echo", handler=json_handler)
+    response = await nats.request_respond("codec.echo", {"id": 7})
+    await nats.wait_msgs(msgs_await=1)
+    return response
@@ -0,0 +1,56 @@
+"""
+test for:
+register_proto
+decoded
+CapturedMsg.proto
+"""
+import asyncio
+from integration_tests.api.simpleMessage_pb2 import MessageBytes, SimpleMessage
+from integration_tests.src.settings import logger, nats_connect_string
+from nats_contractor.nats import NatsQA
+
+
+def test_decoded():
+    nats = NatsQA(logger, ["decoded.a", "decoded.b"], nats_connect_string)
+    nats.register_proto("decoded.*", SimpleMessage)
+    loop = nats.loop = asyncio.get_event_loop()
+    loop.run_until_complete(_test_send(nats))
+    view = nats.decoded("decoded.a")
+    assert [msg.Body for msg in view] == [b'0', b'1']
+    assert view[0] is nats.decoded("decoded.a")[0]
+    assert len(nats.decoded("decoded.b")) == 0
+
+
+def test_captured_msg_proto():
+    nats = NatsQA(logger, ["decoded.a"], nats_connect_string, capture_records=True)
+    nats.register_proto("decoded.a", SimpleMessage)
+    loop = nats.loop = asyncio.get_event_loop()
+    nats_resp = loop.run_until_complete(_test_send(nats))
+    record = nats_resp["decoded.a"][1]
+    assert record.proto.Body == b'1'
+    assert record.proto is record.proto
+
+
+def test_register_proto_again():
+    nats = NatsQA(logger, ["decoded.a"], nats_connect_string)
+    nats.register_proto("decoded.*", SimpleMessage)
+    nats.register_proto("decoded.a", MessageBytes)
+    nats.register_proto("decoded.*", MessageBytes)
+    nats.register_proto("decoded.a", SimpleMessage)
+    assert nats.proto_class("decoded.a") is MessageBytes
+    assert nats.proto_class("decoded.b") is MessageBytes
+    assert len(nats._protos) == 2
+
+
+async def _test_send(nats):
+    messages = []
+    for index in range(2):
+        test_proto = SimpleMessage()
+        test_proto.Body = str(index).encode()
+        messages.append(test_proto)
+
+    await nats.start_listen_all()
+    await nats.send_many("decoded.a", messages)
+    nats_resp = await nats.wait_msgs(msgs_await=2)
+    await nats.close_pool()
+    return nats_resp
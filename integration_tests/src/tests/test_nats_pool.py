@@ -0,0 +1,82 @@
+"""
+test for:
+pool of persistent connections (use_pool, pool_size)
+close_pool
+"""
+import asyncio
+from google.protobuf.reflection import ParseMessage
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import logger, nats_connect_string
+from nats_contractor.nats import NatsQA
+
+
+def _proto(body):
+    proto = SimpleMessage()
+    proto.Body = body
+    return proto
+
+
+def test_pool_reuse():
+    nats = NatsQA(logger, ["pool.topic"], nats_connect_string)
+    loop = nats.loop = asyncio.get_event_loop()
+    first, second, replaced, replaced_connected, nats_resp = loop.run_until_complete(_test_pool_reuse(nats))
+    assert first is second
+    assert replaced is not first and replaced_connected
+    assert [ParseMessage(SimpleMessage.DESCRIPTOR, msg).Body for msg in nats_resp["pool.topic"]] == [b'replaced']
+
+
+async def _test_pool_reuse(nats):
+    for cycle in range(2):
+        await nats.start_listen_all()
+        await nats.send("pool.topic", _proto(str(cycle).encode()))
+        await nats.send("pool.topic", _proto(str(cycle).encode()))
+        await nats.wait_msgs(msgs_await=2)
+        if cycle == 0:
+            first = nats._pool.connections
+    second = nats._pool.connections
+    assert len(first) == len(second) == 1
+
+    await second[0].close()
+    await nats.start_listen_all()
+    await nats.send("pool.topic", _proto(b'replaced'))
+    nats_resp = await nats.wait_msgs(msgs_await=1)
+    replaced = nats._pool.connections[0]
+    replaced_connected = replaced.is_connected
+    await nats.close_pool()
+    return first[0], second[0], replaced, replaced_connected, nats_resp
+
+
+def test_without_pool():
+    nats = NatsQA(logger, ["pool.topic"], nats_connect_string, use_pool=False)
+    loop = nats.loop = asyncio.get_event_loop()
+    nats_resp, connections = loop.run_until_complete(_test_without_pool(nats))
+    assert len(nats_resp["pool.topic"]) == 2
+    assert connections == []
+
+
+async def _test_without_pool(nats):
+    await nats.start_listen_all()
+    await nats.send("pool.topic", _proto(b'0'))
+    await nats.send("pool.topic", _proto(b'1'))
+    nats_resp = await nats.wait_msgs(msgs_await=2)
+    return nats_resp, nats._pool.connections
+
+
+def test_pool_loop_change():
+    nats = NatsQA(logger, ["pool.topic"], nats_connect_string)
+    old_loop = nats.loop = asyncio.get_event_loop()
+    old_loop.run_until_complete(nats.send("pool.topic", _proto(b'old')))
+    old = nats._pool.connections[0]
+
+    new_loop = asyncio.new_event_loop()
+    try:
+        nats.loop = new_loop
+        new_loop.run_until_complete(nats.send("pool.topic", _proto(b'new')))
+        new = nats._pool.connections[0]
+        old_loop.run_until_complete(asyncio.sleep(0.1))
+        assert new is not old and new.is_connected
+        assert old.is_closed
+        new_loop.run_until_complete(nats.close_pool())
+    finally:
+        new_loop.close()
+        nats.loop = old_loop
@@ -0,0 +1,67 @@
+"""
+test for:
+find
+count_where
+group_by
+"""
+import asyncio
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import logger, nats_connect_string
+from nats_contractor.capture_store import RingCaptureStore
+from nats_contractor.nats import NatsQA
+
+
+def test_query():
+    nats = NatsQA(logger, ["query.topic"], nats_connect_string)
+    nats.register_proto("query.topic", SimpleMessage)
+    loop = nats.loop = asyncio.get_event_loop()
+    first_found = loop.run_until_complete(_test_send(nats))
+    assert [msg.Body for msg in first_found] == [b'0', b'2']
+    assert [msg.Body for msg in nats.find("query.topic", ID=0)] == [b'0', b'2', b'4', b'6']
+    assert nats.count_where("query.topic", ID=1, Body=b'3') == 1
+    assert nats.count_where("query.topic", ID=5) == 0
+    assert {key: len(msgs) for key, msgs in nats.group_by("query.topic", "ID").items()} == {0: 4, 1: 3}
+
+
+def test_query_ring_eviction():
+    nats = NatsQA(logger, ["query.topic"], nats_connect_string, capture_store=RingCaptureStore(max_msgs=3))
+    nats.register_proto("query.topic", SimpleMessage)
+    loop = nats.loop = asyncio.get_event_loop()
+    loop.run_until_complete(_test_send(nats))
+    assert [msg.Body for msg in nats.find("query.topic", ID=0)] == [b'4', b'6']
+    assert {key: len(msgs) for key, msgs in nats.group_by("query.topic", "ID").items()} == {0: 2, 1: 1}
+
+
+def test_query_after_subjects_reset():
+    nats = NatsQA(logger, ["query.topic"], nats_connect_string)
+    nats.register_proto("query.topic", SimpleMessage)
+    loop = nats.loop = asyncio.get_event_loop()
+    loop.run_until_complete(_test_send(nats))
+    assert nats.count_where("query.topic", ID=0) == 4
+    nats.subjects = {"query.topic": []}
+    assert nats.find("query.topic", ID=0) == []
+    assert nats.group_by("query.topic", "ID") == {}
+
+    test_proto = SimpleMessage()
+    test_proto.Body = b'new'
+    nats.subjects = {"query.topic": [test_proto.SerializeToString()]}
+    assert [msg.Body for msg in nats.find("query.topic", ID=0)] == [b'new']
+    assert [msg.Body for msg in nats.decoded("query.topic")] == [b'new']
+
+
+async def _test_send(nats):
+    messages = []
+    for index in range(7):
+        test_proto = SimpleMessage()
+        test_proto.ID = index % 2
+        test_proto.Body = str(index).encode()
+        messages.append(test_proto)
+
+    await nats.start_listen_all()
+    await nats.send_many("query.topic", messages[:3])
+    await nats.wait_for("query.topic", count=3)
+    first_found = nats.find("query.topic", ID=0)
+    await nats.send_many("query.topic", messages[3:])
+    await nats.wait_msgs(msgs_await=7)
+    await nats.close_pool()
+    return first_found
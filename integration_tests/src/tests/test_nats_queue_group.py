@@ -0,0 +1,42 @@
+"""
+test for:
+start_listen_all and start_listen_with_respond with queue group
+worker annotation in CapturedMsg
+"""
+import asyncio
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import logger, nats, nats_connect_string, subjects
+from nats_contractor.nats import NatsQA
+
+
+def test_queue_group():
+    loop = nats.loop = asyncio.get_event_loop()
+    workers, responses = loop.run_until_complete(_test_queue_group())
+    captured = [record for worker in workers for record in worker.subjects["test_topic1"]]
+    assert len(captured) == 10
+    assert {record.worker for record in workers[0].subjects["test_topic1"]} <= {"worker_0"}
+    assert {record.worker for record in workers[1].subjects["test_topic1"]} <= {"worker_1"}
+    assert sum(len(worker.subjects["test_topic_queue_respond"]) for worker in workers) == 4
+    assert TimeoutError not in responses
+
+
+async def _test_queue_group():
+    test_proto_1 = SimpleMessage()
+    test_proto_1.Body = b'test_proto_1'
+
+    workers = []
+    for i in range(2):
+        worker = NatsQA(logger, subjects, nats_connect_string, queue="test_queue", worker_id="worker_{}".format(i),
+                        capture_records=True)
+        worker.loop = nats.loop
+        await worker.start_listen_all()
+        await worker.start_listen_with_respond("test_topic_queue_respond", respond_proto=test_proto_1)
+        workers.append(worker)
+
+    await nats.send_many(subjects[0], [test_proto_1] * 10)
+    responses = await nats.request_many("test_topic_queue_respond", [test_proto_1] * 4)
+
+    for worker in workers:
+        await worker.wait_msgs(settle_idle=0.05)
+        await worker.close()
+    return workers, responses
@@ -0,0 +1,37 @@
+"""
+test for:
+request_gather
+"""
+import asyncio
+from google.protobuf.reflection import ParseMessage
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import logger, nats, nats_connect_string
+from nats_contractor.nats import NatsQA
+
+
+def test_request_gather():
+    loop = nats.loop = asyncio.get_event_loop()
+    all_replies, first_replies = loop.run_until_complete(_test_request_gather())
+    assert sorted(ParseMessage(SimpleMessage.DESCRIPTOR, reply).Body for reply in all_replies) == [b'responder_1', b'responder_2']
+    assert len(first_replies) == 1
+
+
+async def _test_request_gather():
+    test_proto_request = SimpleMessage()
+    test_proto_request.Body = b'test_proto_request'
+
+    responders = []
+    for name in (b'responder_1', b'responder_2'):
+        respond_proto = SimpleMessage()
+        respond_proto.Body = name
+        responder = NatsQA(logger, [], nats_connect_string)
+        responder.loop = nats.loop
+        await responder.start_listen_with_respond(topic="test_topic_gather", respond_proto=respond_proto)
+        responders.append(responder)
+
+    all_replies = [reply async for reply in nats.request_gather("test_topic_gather", test_proto_request, window=0.3)]
+    first_replies = [reply async for reply in nats.request_gather("test_topic_gather", test_proto_request, max_replies=1)]
+
+    for responder in responders:
+        await responder.wait_msgs(msgs_await=2)
+    return all_replies, first_replies
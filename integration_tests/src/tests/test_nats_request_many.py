@@ -0,0 +1,35 @@
+"""
+test for:
+request_many
+"""
+import asyncio
+from google.protobuf.reflection import ParseMessage
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import nats
+
+
+def test_request_many():
+    loop = nats.loop = asyncio.get_event_loop()
+    nats_resp, responses, timed_out = loop.run_until_complete(_test_request_many())
+    assert len(nats_resp["test_topic_request_many"]) == 20
+    assert len(responses) == 20
+    assert all(ParseMessage(SimpleMessage.DESCRIPTOR, response).Body == b'test_proto_respond' for response in responses)
+    assert timed_out == [TimeoutError, TimeoutError]
+
+
+async def _test_request_many():
+    protos = []
+    for i in range(20):
+        proto = SimpleMessage()
+        proto.Body = str(i).encode()
+        protos.append(proto)
+
+    test_proto_respond = SimpleMessage()
+    test_proto_respond.Body = b'test_proto_respond'
+
+    await nats.start_listen_all()
+    await nats.start_listen_with_respond(topic="test_topic_request_many", respond_proto=test_proto_respond)
+    responses = await nats.request_many("test_topic_request_many", protos, concurrency=5)
+    timed_out = await nats.request_many("test_topic_without_responder", protos[:2], timeout=0.1)
+    nats_resp = await nats.wait_msgs(msgs_await=20)
+    return nats_resp, responses, timed_out
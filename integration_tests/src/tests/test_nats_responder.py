@@ -0,0 +1,77 @@
+"""
+test for:
+start_listen_with_respond with handler, executor and max_in_flight
+responder_stats
+"""
+import asyncio
+from google.protobuf.reflection import ParseMessage
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import nats
+
+
+def echo_handler(data):
+    request = ParseMessage(SimpleMessage.DESCRIPTOR, data)
+    response = SimpleMessage()
+    response.Body = b'echo_' + request.Body
+    return response
+
+
+async def async_echo_handler(data):
+    await asyncio.sleep(0.01)
+    return echo_handler(data).SerializeToString()
+
+
+def test_responder_handlers():
+    loop = nats.loop = asyncio.get_event_loop()
+    responses, async_responses, stats = loop.run_until_complete(_test_responder())
+    assert [ParseMessage(SimpleMessage.DESCRIPTOR, response).Body for response in responses] == \
+        [b'echo_0', b'echo_1', b'echo_2', b'echo_3']
+    assert [ParseMessage(SimpleMessage.DESCRIPTOR, response).Body for response in async_responses] == \
+        [b'echo_0', b'echo_1', b'echo_2', b'echo_3']
+    assert stats["test_topic_echo"].responded == 4
+    assert stats["test_topic_echo_async"].errors == 0
+    assert stats["test_topic_echo_async"].max_latency > 0
+
+
+async def _test_responder():
+    protos = []
+    for i in range(4):
+        proto = SimpleMessage()
+        proto.Body = str(i).encode()
+        protos.append(proto)
+
+    await nats.start_listen_all()
+    await nats.start_listen_with_respond("test_topic_echo", handler=echo_handler, executor="thread", max_in_flight=2)
+    await nats.start_listen_with_respond("test_topic_echo_async", handler=async_echo_handler, max_in_flight=4)
+    responses = await nats.request_many("test_topic_echo", protos)
+    async_responses = await nats.request_many("test_topic_echo_async", protos)
+    await nats.wait_msgs(msgs_await=8)
+    stats = dict(nats.responder_stats)
+    await nats.close()
+    return responses, async_responses, stats
+
+
+async def slow_echo_handler(data):
+    await asyncio.sleep(0.2)
+    return data
+
+
+def test_responder_close_waits_responses():
+    loop = nats.loop = asyncio.get_event_loop()
+    stats, tasks_left = loop.run_until_complete(_test_responder_close())
+    assert stats.responded == 1
+    assert stats.errors == 0
+    assert tasks_left == 0
+
+
+async def _test_responder_close():
+    proto = SimpleMessage()
+    proto.Body = b'slow'
+
+    await nats.start_listen_with_respond("test_topic_echo_slow", handler=slow_echo_handler, max_in_flight=2)
+    await nats.request_respond("test_topic_echo_slow", proto, timeout=0.05)
+    await nats.wait_msgs(msgs_await=1)
+    stats = nats.responder_stats["test_topic_echo_slow"]
+    tasks_left = len(nats._respond_tasks)
+    await nats.close()
+    return stats, tasks_left
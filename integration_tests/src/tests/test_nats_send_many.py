@@ -0,0 +1,35 @@
+"""
+test for:
+send_many
+"""
+import asyncio
+from google.protobuf.reflection import ParseMessage
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import nats, logger, subjects
+
+
+def test_send_many():
+    loop = nats.loop = asyncio.get_event_loop()
+    nats_resp, failed = loop.run_until_complete(_test_send_many())
+    logger.info("nats resp: {}".format(nats_resp))
+    assert failed == []
+    assert [ParseMessage(SimpleMessage.DESCRIPTOR, msg).Body for msg in nats_resp["test_topic1"]] == \
+        [b'test_proto_0', b'test_proto_1', b'test_proto_2']
+    assert ParseMessage(SimpleMessage.DESCRIPTOR, nats_resp["test_topic2"][0]).Body == b'test_proto_pair'
+
+
+async def _test_send_many():
+    protos = []
+    for i in range(3):
+        proto = SimpleMessage()
+        proto.Body = 'test_proto_{}'.format(i).encode()
+        protos.append(proto)
+
+    test_proto_pair = SimpleMessage()
+    test_proto_pair.Body = b'test_proto_pair'
+
+    await nats.start_listen_all()
+    failed = await nats.send_many(subjects[0], protos)
+    failed += await nats.send_many([(subjects[1], test_proto_pair)])
+    nats_resp = await nats.wait_msgs(msgs_await=4)
+    return nats_resp, failed
@@ -0,0 +1,37 @@
+"""
+test for:
+send with raw bytes
+serialize cache
+"""
+import asyncio
+from google.protobuf.reflection import ParseMessage
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import logger, subjects, nats_connect_string
+from nats_contractor.nats import NatsQA
+
+
+def test_serialize_cache():
+    nats = NatsQA(logger, subjects, nats_connect_string, serialize_cache_size=8)
+    loop = nats.loop = asyncio.get_event_loop()
+    nats_resp = loop.run_until_complete(_test_send(nats))
+    assert [ParseMessage(SimpleMessage.DESCRIPTOR, msg).Body for msg in nats_resp["test_topic1"]] == \
+        [b'template', b'template', b'changed', b'raw', b'raw']
+    assert nats.serialize_cache.hits == 1
+    assert nats.serialize_cache.misses == 2
+
+
+async def _test_send(nats):
+    template = SimpleMessage()
+    template.Body = b'template'
+    raw = SimpleMessage(Body=b'raw').SerializeToString()
+
+    await nats.start_listen_all()
+    await nats.send("test_topic1", template)
+    await nats.send("test_topic1", template)
+    template.Body = b'changed'
+    await nats.send("test_topic1", template)
+    await nats.send("test_topic1", raw)
+    await nats.send("test_topic1", memoryview(bytearray(raw)))
+    nats_resp = await nats.wait_msgs(msgs_await=5)
+    await nats.close_pool()
+    return nats_resp
@@ -0,0 +1,41 @@
+"""
+test for:
+keep-warm session (async with)
+reset
+close
+"""
+import asyncio
+from google.protobuf.reflection import ParseMessage
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import nats, subjects
+
+
+def test_session():
+    loop = nats.loop = asyncio.get_event_loop()
+    first_resp, second_resp, listener_reused = loop.run_until_complete(_test_session())
+    assert ParseMessage(SimpleMessage.DESCRIPTOR, first_resp["test_topic1"][0]).Body == b'test_proto_1'
+    assert first_resp["test_topic2"] == []
+    assert second_resp["test_topic1"] == []
+    assert ParseMessage(SimpleMessage.DESCRIPTOR, second_resp["test_topic2"][0]).Body == b'test_proto_2'
+    assert listener_reused
+    assert nats.keep_alive is False
+
+
+async def _test_session():
+    test_proto_1 = SimpleMessage()
+    test_proto_1.Body = b'test_proto_1'
+
+    test_proto_2 = SimpleMessage()
+    test_proto_2.Body = b'test_proto_2'
+
+    async with nats:
+        listener = nats._nc
+        await nats.start_listen_all()
+        await nats.send(subjects[0], test_proto_1)
+        first_resp = await nats.wait_msgs(msgs_await=1)
+
+        await nats.start_listen_all()
+        await nats.send(subjects[1], test_proto_2)
+        second_resp = await nats.wait_msgs(msgs_await=1)
+        listener_reused = nats._nc is listener
+    return first_resp, second_resp, listener_reused
@@ -0,0 +1,30 @@
+"""
+test for:
+wait_msgs in settle mode
+settle
+"""
+import asyncio
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import nats, subjects
+
+
+def test_settle_catch_slow_producer():
+    loop = nats.loop = asyncio.get_event_loop()
+    nats_resp = loop.run_until_complete(_test_settle())
+    assert len(nats_resp["test_topic1"]) == 3
+
+
+async def _test_settle():
+    test_proto_1 = SimpleMessage()
+    test_proto_1.Body = b'test_proto_1'
+
+    async def slow_producer():
+        for _ in range(3):
+            await nats.send(subjects[0], test_proto_1)
+            await asyncio.sleep(0.05)
+
+    await nats.start_listen_all()
+    producer = asyncio.ensure_future(slow_producer())
+    nats_resp = await nats.wait_msgs(msgs_await=1, settle_idle=0.2, settle_max=2)
+    await producer
+    return nats_resp
@@ -0,0 +1,51 @@
+"""
+test for:
+stream
+"""
+import asyncio
+from google.protobuf.reflection import ParseMessage
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import nats
+
+
+def test_stream():
+    loop = nats.loop = asyncio.get_event_loop()
+    streamed = loop.run_until_complete(_test_stream())
+    assert [ParseMessage(SimpleMessage.DESCRIPTOR, msg).Body for msg in streamed] == [b'0', b'1', b'2']
+
+
+def test_stream_full_queue():
+    loop = nats.loop = asyncio.get_event_loop()
+    streamed = loop.run_until_complete(_test_stream(maxsize=2, max_msgs=5, consume_delay=0.02))
+    assert [ParseMessage(SimpleMessage.DESCRIPTOR, msg).Body for msg in streamed] == \
+        [b'0', b'1', b'2', b'3', b'4']
+    assert nats.stream_dropped.get("test_topic_stream", 0) == 0
+
+
+def test_stream_drop_when_full():
+    loop = nats.loop = asyncio.get_event_loop()
+    streamed = loop.run_until_complete(_test_stream(maxsize=2, max_msgs=5, consume_delay=0.02, drop_when_full=True))
+    bodies = [ParseMessage(SimpleMessage.DESCRIPTOR, msg).Body for msg in streamed]
+    assert bodies[:2] == [b'0', b'1']
+    assert len(bodies) + nats.stream_dropped["test_topic_stream"] == 5
+
+
+async def _test_stream(maxsize=10, max_msgs=3, consume_delay=0, drop_when_full=False):
+    protos = []
+    for i in range(5):
+        proto = SimpleMessage()
+        proto.Body = str(i).encode()
+        protos.append(proto)
+
+    async def consume():
+        streamed = []
+        async for msg in nats.stream("test_topic_stream", max_msgs=max_msgs, timeout=0.3, maxsize=maxsize,
+                                     drop_when_full=drop_when_full):
+            streamed.append(msg)
+            await asyncio.sleep(consume_delay)
+        return streamed
+
+    consumer = asyncio.ensure_future(consume())
+    await asyncio.sleep(0.1)
+    await nats.send_many("test_topic_stream", protos)
+    return await consumer
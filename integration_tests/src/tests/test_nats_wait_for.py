@@ -0,0 +1,93 @@
+"""
+test for:
+expect
+wait_for
+"""
+import asyncio
+import logging
+from google.protobuf.reflection import ParseMessage
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import nats, logger, subjects, nats_connect_string
+from nats_contractor.nats import NatsQA
+
+
+def test_wait_for():
+    loop = nats.loop = asyncio.get_event_loop()
+    nats_resp, waited = loop.run_until_complete(_test_wait_for())
+    logger.info("nats resp: {}".format(nats_resp))
+    assert waited is True
+    assert len(nats_resp["test_topic1"]) == 2
+    assert ParseMessage(SimpleMessage.DESCRIPTOR, nats_resp["test_topic2"][-1]).Body == b'test_proto_last'
+
+
+def test_wait_for_timeout():
+    loop = nats.loop = asyncio.get_event_loop()
+    waited = loop.run_until_complete(_test_wait_for_timeout())
+    assert waited is False
+
+
+def test_wait_for_count_with_expectations():
+    loop = nats.loop = asyncio.get_event_loop()
+    waited, registered = loop.run_until_complete(_test_wait_for_count_with_expectations())
+    assert waited is False
+    assert registered == 0
+
+
+async def _test_wait_for_count_with_expectations():
+    test_proto_1 = SimpleMessage()
+    test_proto_1.Body = b'test_proto_1'
+
+    await nats.start_listen_all()
+    topic_2 = nats.expect(subjects[1])
+    nats.expect(subjects[0])
+    await nats.send_many([(subjects[1], test_proto_1)])
+    waited = await nats.wait_for(count=2, expectations=[topic_2], timeout=0.2)
+    registered = len(nats._expectations)
+    await nats.wait_msgs()
+    return waited, registered
+
+
+async def _test_wait_for():
+    test_proto_1 = SimpleMessage()
+    test_proto_1.Body = b'test_proto_1'
+
+    test_proto_last = SimpleMessage()
+    test_proto_last.Body = b'test_proto_last'
+
+    await nats.start_listen_all()
+    last = nats.expect(subjects[1], predicate=lambda msg: ParseMessage(SimpleMessage.DESCRIPTOR, msg).Body == b'test_proto_last')
+    await nats.send_many([(subjects[0], test_proto_1), (subjects[1], test_proto_1),
+                          (subjects[0], test_proto_1), (subjects[1], test_proto_last)])
+    waited = await nats.wait_for(subject=subjects[0], count=2, expectations=[last])
+    nats_resp = await nats.wait_msgs()
+    return nats_resp, waited
+
+
+async def _test_wait_for_timeout():
+    await nats.start_listen_all()
+    waited = await nats.wait_for(subject=subjects[0], count=1, timeout=0.1)
+    await nats.wait_msgs()
+    return waited
+
+
+class _ListLogger(logging.Logger):
+
+    def __init__(self):
+        logging.Logger.__init__(self, "wait-for-test", logging.INFO)
+        self.records = []
+
+    def handle(self, record):
+        self.records.append(record.getMessage())
+
+
+def _broken_predicate(msg):
+    raise ValueError("broken")
+
+
+def test_expect_predicate_errors_rate_limited():
+    list_logger = _ListLogger()
+    local_nats = NatsQA(list_logger, ["test_topic1"], nats_connect_string)
+    local_nats.subjects = {"test_topic1": [b'1', b'2', b'3']}
+    expectation = local_nats.expect("test_topic1", predicate=_broken_predicate)
+    assert expectation.matched == 0
+    assert list_logger.records == ["nats_base expectation predicate error: broken"]
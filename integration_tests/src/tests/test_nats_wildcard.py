@@ -0,0 +1,31 @@
+"""
+test for:
+start_listen_all with wildcard subjects
+"""
+import asyncio
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import logger, nats_connect_string
+from nats_contractor.nats import NatsQA
+
+
+def test_wildcard_subjects():
+    nats = NatsQA(logger, ["orders.>", "orders.new"], nats_connect_string)
+    loop = nats.loop = asyncio.get_event_loop()
+    nats_resp = loop.run_until_complete(_test_send(nats))
+    assert len(nats_resp["orders.>"]) == 3
+    assert len(nats_resp["orders.new"]) == 2
+    assert len(nats_resp["orders.paid.eu"]) == 1
+    assert nats.total_msg == 3
+
+
+async def _test_send(nats):
+    test_proto_1 = SimpleMessage()
+    test_proto_1.Body = b'test_proto_1'
+
+    await nats.start_listen_all()
+    await nats.send_many([("orders.new", test_proto_1), ("orders.paid.eu", test_proto_1), ("orders.new", test_proto_1)])
+    waited = await nats.wait_for(subject="orders.*", count=2)
+    nats_resp = await nats.wait_msgs(msgs_await=3)
+    await nats.close_pool()
+    assert waited
+    return nats_resp
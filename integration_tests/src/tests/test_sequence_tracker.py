@@ -0,0 +1,49 @@
+"""
+test for:
+SequenceTracker
+"""
+from nats_contractor.sequence_tracker import SequenceTracker
+
+
+def test_sequence_tracker_in_order():
+    tracker = SequenceTracker()
+    assert all(tracker.add(seq) for seq in range(1, 101))
+    assert tracker.report() == {"received": 100, "duplicates": 0, "redelivered": 0, "out_of_order": 0, "last": 100,
+                                "missing": 0, "gaps": []}
+    assert tracker.low == 100
+
+
+def test_sequence_tracker_gaps_duplicates_reorder():
+    tracker = SequenceTracker()
+    for seq in (10, 11, 14, 13, 18):
+        assert tracker.add(seq)
+    assert not tracker.add(13, redelivered=True)
+    assert not tracker.add(10)
+    report = tracker.report()
+    assert report["gaps"] == [(12, 12), (15, 17)]
+    assert report["missing"] == 4
+    assert report["duplicates"] == 2
+    assert report["redelivered"] == 1
+    assert report["out_of_order"] == 1
+
+    assert tracker.add(12)
+    assert tracker.low == 14
+    assert tracker.gaps() == [(15, 17)]
+
+
+def test_sequence_tracker_persistent_gap():
+    tracker = SequenceTracker()
+    assert tracker.add(1)
+    for seq in range(3, 200003):
+        assert tracker.add(seq)
+    for seq in range(200010, 200020, 2):
+        assert tracker.add(seq)
+    assert not tracker.add(100000)
+    assert tracker.gaps() == [(2, 2), (200003, 200009), (200011, 200011), (200013, 200013), (200015, 200015),
+                              (200017, 200017)]
+    assert tracker.missing() == 12
+    assert tracker.low == 1
+
+    assert tracker.add(2)
+    assert tracker.low == 200002
+    assert tracker.gaps()[0] == (200003, 200009)
@@ -0,0 +1,33 @@
+"""
+test for:
+fetch_range
+"""
+import asyncio
+from google.protobuf.reflection import ParseMessage
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import stan, subjects
+
+
+def test_fetch_range():
+    loop = stan.loop = asyncio.get_event_loop()
+    items, empty, subs_left = loop.run_until_complete(_test_fetch_range())
+    assert [ParseMessage(SimpleMessage.DESCRIPTOR, item).Body for item in items] == \
+        ["range_{}".format(index).encode() for index in range(6)]
+    assert empty == []
+    assert subs_left == 0
+
+
+async def _test_fetch_range():
+    await stan.start_listen_all(durable_name=None)
+    for index in range(6):
+        proto = SimpleMessage()
+        proto.Body = "range_{}".format(index).encode()
+        await stan.send(subjects[0], proto)
+    await stan.wait_msgs(msgs_await=6)
+    last = stan.sequence_report(subjects[0])["last"]
+
+    items = await stan.fetch_range(subjects[0], last - 5, last, workers=4)
+    empty = await stan.fetch_range(subjects[0], last, last - 1)
+    subs_left = len(stan._pub_sc._sub_map)
+    await stan.close()
+    return items, empty, subs_left
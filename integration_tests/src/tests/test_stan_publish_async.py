@@ -0,0 +1,29 @@
+"""
+test for:
+publish_async
+flush_acks
+"""
+import asyncio
+from google.protobuf.reflection import ParseMessage
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import stan, subjects
+
+
+def test_publish_async():
+    loop = stan.loop = asyncio.get_event_loop()
+    stan_resp, failed = loop.run_until_complete(_test_publish_async())
+    assert failed == []
+    assert [ParseMessage(SimpleMessage.DESCRIPTOR, msg).Body for msg in stan_resp[subjects[0]]] == \
+        [str(index).encode() for index in range(10)]
+
+
+async def _test_publish_async():
+    await stan.start_listen_all()
+    for index in range(10):
+        test_proto = SimpleMessage()
+        test_proto.Body = str(index).encode()
+        await stan.publish_async(subjects[0], test_proto)
+    failed = await stan.flush_acks()
+    stan_resp = await stan.wait_msgs(msgs_await=10)
+    await stan.close()
+    return stan_resp, failed
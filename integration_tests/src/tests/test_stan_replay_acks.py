@@ -0,0 +1,70 @@
+"""
+test for:
+start_listen_all with start_at (replay), manual_acks and ack_batch
+sequence_report
+"""
+import asyncio
+from google.protobuf.reflection import ParseMessage
+from integration_tests.api.simpleMessage_pb2 import SimpleMessage
+from integration_tests.src.settings import stan, subjects
+
+
+def _protos(prefix, count):
+    protos = []
+    for index in range(count):
+        proto = SimpleMessage()
+        proto.Body = "{}_{}".format(prefix, index).encode()
+        protos.append(proto)
+    return protos
+
+
+def _bodies(msgs):
+    return [ParseMessage(SimpleMessage.DESCRIPTOR, msg).Body for msg in msgs]
+
+
+def test_replay():
+    loop = stan.loop = asyncio.get_event_loop()
+    from_sequence, from_first = loop.run_until_complete(_test_replay())
+    expected = [b'replay_0', b'replay_1', b'replay_2']
+    assert _bodies(from_sequence[subjects[0]]) == expected
+    assert _bodies(from_first[subjects[0]])[-3:] == expected
+
+
+async def _test_replay():
+    await stan.start_listen_all(durable_name=None)
+    for proto in _protos("replay", 3):
+        await stan.send(subjects[0], proto)
+    await stan.wait_msgs(msgs_await=3)
+    last = stan.sequence_report(subjects[0])["last"]
+
+    await stan.start_listen_all(durable_name=None, start_at="sequence", sequence=last - 2)
+    from_sequence = dict(await stan.wait_msgs(msgs_await=3))
+
+    await stan.start_listen_all(durable_name=None, start_at="first")
+    from_first = dict(await stan.wait_msgs(msgs_await=last))
+    return from_sequence, from_first
+
+
+def test_manual_acks():
+    loop = stan.loop = asyncio.get_event_loop()
+    stan_resp, report, pending_acks, ack_task = loop.run_until_complete(_test_manual_acks())
+    assert _bodies(stan_resp[subjects[0]]) == [proto.Body for proto in _protos("ack", 5)]
+    assert report["received"] == 5
+    assert report["redelivered"] == 0
+    assert report["duplicates"] == 0
+    assert pending_acks == 0
+    assert ack_task.cancelled()
+
+
+async def _test_manual_acks():
+    await stan.start_listen_all(durable_name=None, manual_acks=True, ack_batch=2, ack_interval=0.05, max_inflight=4,
+                                ack_wait=1)
+    ack_task = stan._ack_task
+    for proto in _protos("ack", 5):
+        await stan.send(subjects[0], proto)
+    await stan.wait_for(count=5)
+    await asyncio.sleep(0.1)
+    pending_acks = len(stan._pending_acks)
+    stan_resp = await stan.wait_msgs(msgs_await=5, add_await=1.5)
+    await asyncio.sleep(0)
+    return stan_resp, stan.sequence_report(subjects[0]), pending_acks, ack_task
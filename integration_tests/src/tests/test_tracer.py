@@ -0,0 +1,85 @@
+"""
+test for:
+Tracer
+"""
+import logging
+from nats_contractor.tracer import Tracer
+
+
+class _Payload:
+    formatted = 0
+
+    def __str__(self):
+        _Payload.formatted += 1
+        return "x" * 1000
+
+
+class _ListLogger(logging.Logger):
+
+    def __init__(self, level=logging.INFO):
+        logging.Logger.__init__(self, "tracer-test", level)
+        self.records = []
+
+    def handle(self, record):
+        self.records.append(record.getMessage())
+
+
+def test_tracer_level_and_sampling():
+    logger = _ListLogger(level=logging.ERROR)
+    tracer = Tracer(logger)
+    tracer.info("topic", "nats {} > {}", "topic", _Payload())
+    assert logger.records == [] and _Payload.formatted == 0
+
+    logger = _ListLogger()
+    tracer = Tracer(logger, max_payload=10)
+    tracer.set_sample_rate("orders.*", 0.25)
+    for _ in range(8):
+        tracer.info("orders.new", "nats {} > {}", "orders.new", _Payload())
+    tracer.info("other", "nats {} > {}", "other", b'y' * 20)
+    assert len(logger.records) == 3
+    assert logger.records[0] == "nats orders.new > xxxxxxxxxx...(1000 chars)"
+    assert logger.records[1] == logger.records[0]
+    assert logger.records[2] == "nats other > b'yyyyyyyyyy'...(20 bytes)"
+
+
+def test_tracer_error_rate_limit():
+    logger = _ListLogger()
+    tracer = Tracer(logger, error_interval=60)
+    for index in range(5):
+        tracer.error("nats total_handle", "nats total_handle error: {}", index)
+    assert logger.records == ["nats total_handle error: 0"]
+    tracer._errors["nats total_handle"] = (tracer._errors["nats total_handle"][0] - 60, 4)
+    tracer.error("nats total_handle", "nats total_handle error: {}", 5)
+    assert logger.records[1] == "nats total_handle error: 5 (same errors skipped: 4)"
+
+
+def test_tracer_sampling_rate():
+    for rate, count in ((0.75, 75), (0.6, 60), (0.5, 50), (0.01, 1)):
+        logger = _ListLogger()
+        tracer = Tracer(logger, sample_rate=rate)
+        for _ in range(100):
+            tracer.info("topic", "msg")
+        assert len(logger.records) == count
+
+
+def test_tracer_flush_skipped_errors():
+    logger = _ListLogger()
+    tracer = Tracer(logger, error_interval=60)
+    for index in range(3):
+        tracer.error("nats total_handle", "nats total_handle error: {}", index)
+    tracer.error("nats stream", "nats stream error: {}", 0)
+    tracer.flush()
+    assert logger.records == ["nats total_handle error: 0", "nats stream error: 0",
+                              "nats total_handle errors skipped: 2"]
+    tracer.flush()
+    assert len(logger.records) == 3
+
+
+def test_tracer_change_sample_rate():
+    logger = _ListLogger()
+    tracer = Tracer(logger)
+    tracer.set_sample_rate("orders.*", 0)
+    tracer.set_sample_rate("orders.*", 1)
+    for _ in range(10):
+        tracer.info("orders.new", "msg")
+    assert len(logger.records) == 10
@@ -0,0 +1,116 @@
+"""
+secondary hash indexes on protobuf fields of captured msgs, built on first query and updated on every new msg
+"""
+from collections import deque
+
+
+def field_value(proto, field: str):
+    """
+    :param proto: protobuf
+    :param field: field name, nested fields are separated with dot: "order.id"
+    :return: hashable value of field, repeated fields are converted to tuple
+    """
+    value = proto
+    for name in field.split("."):
+        value = getattr(value, name)
+    if not isinstance(value, (str, bytes, int, float, bool)):
+        value = tuple(value) if hasattr(value, "__len__") else value.SerializeToString()
+    return value
+
+
+class CaptureIndex:
+
+    def __init__(self, decode):
+        """
+        every topic keeps count of appended msgs, so position of msg is its number from topic clear,
+        msgs evicted from ring capture store are oldest ones and are dropped from index by position lazily on query
+        :param decode: callable(topic, item) -> protobuf of captured item
+        """
+        self._decode = decode
+        self._appended = {}
+        self._fields = {}
+
+    def clear(self):
+        """
+        drop all indexes and counters
+        """
+        self._appended = {}
+        self._fields = {}
+
+    def append(self, subject: str, item):
+        """
+        count msg stored in capture store and add it in all indexes of topic
+        :param subject: topic in capture store
+        :param item: stored item
+        """
+        position = self._appended.get(subject, 0)
+        self._appended[subject] = position + 1
+        fields = self._fields.get(subject)
+        if fields:
+            self._add(fields, position, self._decode(subject, item))
+
+    def lookup(self, subject: str, field: str, value, items) -> list:
+        """
+        :param subject: topic in capture store
+        :param field: indexed field
+        :param value: value of field
+        :param items: msgs of topic in capture store now
+        :return: list of protobufs of alive msgs with field == value, in arrival order
+        """
+        index = self._index(subject, field, items)
+        entries = index.get(value)
+        if entries is None:
+            return []
+        self._purge(index, value, self._first_alive(subject, items))
+        return [proto for _, proto in index.get(value, ())]
+
+    def groups(self, subject: str, field: str, items) -> dict:
+        """
+        :param subject: topic in capture store
+        :param field: indexed field
+        :param items: msgs of topic in capture store now
+        :return: dict of field value -> list of protobufs of alive msgs, in arrival order
+        """
+        index = self._index(subject, field, items)
+        first_alive = self._first_alive(subject, items)
+        for value in list(index):
+            self._purge(index, value, first_alive)
+        return {value: [proto for _, proto in entries] for value, entries in index.items()}
+
+    def _index(self, subject: str, field: str, items) -> dict:
+        """
+        :return: index of field of topic, build it from stored msgs on first use
+        """
+        fields = self._fields.setdefault(subject, {})
+        index = fields.get(field)
+        if index is None:
+            index = fields[field] = {}
+            if self._appended.get(subject, 0) < len(items):
+                self._appended[subject] = len(items)
+            first = self._first_alive(subject, items)
+            for position, item in enumerate(items, first):
+                self._add({field: index}, position, self._decode(subject, item))
+        return index
+
+    def _first_alive(self, subject: str, items) -> int:
+        """
+        :return: position of oldest msg of topic which is still in capture store
+        """
+        return self._appended.get(subject, 0) - len(items)
+
+    @staticmethod
+    def _add(fields: dict, position: int, proto):
+        for field, index in fields.items():
+            value = field_value(proto, field)
+            entries = index.get(value)
+            if entries is None:
+                entries = index[value] = deque()
+            entries.append((position, proto))
+
+    @staticmethod
+    def _purge(index: dict, value, first_alive: int):
+        entries = index[value]
+        while entries and entries[0][0] < first_alive:
+            entries.popleft()
+        if not entries:
+            del index[value]
@@ -0,0 +1,169 @@
+"""
+storages for msgs received in nats/stan handlers
+"""
+from collections import deque
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+
+class CaptureStore:
+
+    def __init__(self):
+        """
+        unbounded storage, all msgs of topic kept in list for all session
+        """
+        self._data = {}
+
+    def __contains__(self, subject):
+        return subject in self._data
+
+    def __iter__(self):
+        return iter(list(self._data))
+
+    def items(self):
+        """
+        :return: list of (topic, msgs) pairs
+        """
+        return list(self._data.items())
+
+    def get(self, subject: str):
+        """
+        :param subject: topic
+        :return: stored msgs of topic, empty tuple for unknown topic
+        """
+        return self._data.get(subject, ())
+
+    def clear(self, subjects=()):
+        """
+        drop all stored msgs and topics
+        :param subjects: list of topics created empty after clear
+        """
+        self._data = {}
+        for subject in subjects:
+            self.add_subject(subject)
+
+    def add_subject(self, subject: str):
+        """
+        create empty topic, drop its msgs if it exists
+        :param subject: topic
+        """
+        self._data[subject] = []
+
+    def append(self, subject: str, msg) -> bool:
+        """
+        store msg, raise KeyError for unknown topic
+        :param subject: topic
+        :param msg: received msg
+        :return: True if msg stored
+        """
+        self._data[subject].append(msg)
+        return True
+
+    def snapshot(self) -> dict:
+        """
+        :return: dict of all msgs, format {"topic_1": [b'received msg 1', b'received msg 2'], ...}
+        """
+        return self._data
+
+    def load(self, subjects: dict):
+        """
+        replace all stored msgs
+        :param subjects: dict of msgs in snapshot format
+        """
+        self.clear()
+        for subject, msgs in subjects.items():
+            self.add_subject(subject)
+            for msg in msgs:
+                self.append(subject, msg)
+
+
+class RingCaptureStore(CaptureStore):
+
+    def __init__(self, max_msgs=None, max_bytes=None, policy=DROP_OLDEST):
+        """
+        bounded storage, every topic keeps not more than max_msgs msgs and max_bytes bytes of payloads
+
+        :param max_msgs: int, max count of msgs for one topic, None for unlimited
+        :param max_bytes: int, max sum of msgs size for one topic, None for unlimited
+        :param policy: DROP_OLDEST for evict oldest msgs on overflow, DROP_NEWEST for drop new msg
+        """
+        if policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError("unknown capture store policy: {}".format(policy))
+
+        CaptureStore.__init__(self)
+        self.max_msgs = max_msgs
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self._bytes = {}
+        self._evicted = {}
+        self._dropped = {}
+
+    @property
+    def evicted(self) -> dict:
+        """
+        :return: dict of count of msgs evicted by DROP_OLDEST policy, format {"topic_1": 10, ...}
+        """
+        return dict(self._evicted)
+
+    @property
+    def dropped(self) -> dict:
+        """
+        :return: dict of count of msgs dropped by DROP_NEWEST policy, format {"topic_1": 10, ...}
+        """
+        return dict(self._dropped)
+
+    def stats(self, subject: str) -> dict:
+        """
+        :param subject: topic
+        :return: dict with stored msgs and bytes, evicted and dropped counters of topic
+        """
+        return {
+            "msgs": len(self._data.get(subject, ())),
+            "bytes": self._bytes.get(subject, 0),
+            "evicted": self._evicted.get(subject, 0),
+            "dropped": self._dropped.get(subject, 0),
+        }
+
+    def clear(self, subjects=()):
+        self._bytes, self._evicted, self._dropped = {}, {}, {}
+        CaptureStore.clear(self, subjects)
+
+    def add_subject(self, subject: str):
+        maxlen = self.max_msgs if self.policy == DROP_OLDEST else None
+        self._data[subject] = deque(maxlen=maxlen)
+        self._bytes[subject] = 0
+        self._evicted[subject] = 0
+        self._dropped[subject] = 0
+
+    def append(self, subject: str, msg) -> bool:
+        bucket = self._data[subject]
+        size = len(msg)
+
+        if self.policy == DROP_NEWEST:
+            if (self.max_msgs is not None and len(bucket) >= self.max_msgs) or \
+                    (self.max_bytes is not None and self._bytes[subject] + size > self.max_bytes):
+                self._dropped[subject] += 1
+                return False
+            bucket.append(msg)
+            self._bytes[subject] += size
+            return True
+
+        if bucket.maxlen is not None and len(bucket) == bucket.maxlen:
+            self._evict(subject, bucket)
+        bucket.append(msg)
+        self._bytes[subject] += size
+        if self.max_bytes is not None:
+            while self._bytes[subject] > self.max_bytes and len(bucket) > 1:
+                self._evict(subject, bucket)
+        return True
+
+    def snapshot(self) -> dict:
+        return {subject: list(bucket) for subject, bucket in self._data.items()}
+
+    def _evict(self, subject: str, bucket: deque):
+        """
+        drop oldest msg of topic
+        """
+        self._bytes[subject] -= len(bucket.popleft())
+        self._evicted[subject] += 1
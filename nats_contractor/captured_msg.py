@@ -0,0 +1,59 @@
+"""
+compact record of msg received in nats/stan handlers
+"""
+
+
+class CapturedMsg:
+    __slots__ = ("subject", "data", "reply", "arrival_ns", "seq", "timestamp", "redelivered", "worker", "proto_class",
+                 "_proto")
+
+    def __init__(self, subject: str, data: bytes, reply="", arrival_ns=0, seq=None, timestamp=None, redelivered=False,
+                 worker=None, proto_class=None):
+        """
+        :param subject: topic of msg
+        :param data: payload bytes of received msg, stored as is without copy
+        :param reply: reply topic of nats msg, empty for stan msg
+        :param arrival_ns: int, time.monotonic_ns() of msg arrival in handler
+        :param seq: stan msg sequence, None for nats msg
+        :param timestamp: stan msg timestamp (ns), None for nats msg
+        :param redelivered: stan redelivered flag
+        :param worker: id of worker (listener process) which handled msg
+        :param proto_class: protobuf class for decode payload in proto, None if class isn`t registered for subject
+        """
+        self.subject = subject
+        self.data = data
+        self.reply = reply
+        self.arrival_ns = arrival_ns
+        self.seq = seq
+        self.timestamp = timestamp
+        self.redelivered = redelivered
+        self.worker = worker
+        self.proto_class = proto_class
+        self._proto = None
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bytes__(self):
+        return bytes(self.data)
+
+    def __repr__(self):
+        return "<CapturedMsg subject={} size={} seq={}>".format(self.subject, len(self.data), self.seq)
+
+    @property
+    def payload(self) -> memoryview:
+        """
+        :return: zero-copy view of payload
+        """
+        return memoryview(self.data)
+
+    @property
+    def proto(self):
+        """
+        :return: payload decoded with proto_class, decoded on first access and cached
+        """
+        if self._proto is None:
+            if self.proto_class is None:
+                raise ValueError("protobuf class isn`t registered for subject {}".format(self.subject))
+            self._proto = self.proto_class.FromString(bytes(self.data))
+        return self._proto
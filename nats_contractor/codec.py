@@ -0,0 +1,238 @@
+"""
+codecs of msgs payload (protobuf, json, msgpack, raw) with optional compression stage
+compressed payload starts with marker byte of compression, so receiver decodes every payload of codec subject
+"""
+import json
+import time
+import zlib
+from nats_contractor.serialize_cache import RAW_TYPES
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+PROTOBUF = "protobuf"
+JSON = "json"
+MSGPACK = "msgpack"
+RAW = "raw"
+
+ZLIB = "zlib"
+LZ4 = "lz4"
+
+MARKER_PLAIN = 0
+MARKER_ZLIB = 1
+MARKER_LZ4 = 2
+
+
+class ProtobufCodec:
+
+    def __init__(self, proto_class=None):
+        """
+        :param proto_class: protobuf class for decode, None for encode only
+        """
+        self.proto_class = proto_class
+
+    def encode(self, message) -> bytes:
+        """
+        serialize protobuf
+        """
+        return message.SerializeToString()
+
+    def decode(self, data: bytes):
+        """
+        parse payload with proto_class
+        """
+        if self.proto_class is None:
+            raise ValueError("protobuf codec without proto_class can`t decode msgs")
+        return self.proto_class.FromString(data)
+
+
+class JsonCodec:
+
+    def encode(self, message) -> bytes:
+        """
+        compact utf-8 json of message
+        """
+        return json.dumps(message, separators=(",", ":")).encode()
+
+    def decode(self, data: bytes):
+        """
+        parse utf-8 json payload
+        """
+        return json.loads(data.decode())
+
+
+class MsgpackCodec:
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError("msgpack codec needs msgpack package: pip install msgpack")
+
+    def encode(self, message) -> bytes:
+        """
+        pack message with bin type for bytes
+        """
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, data: bytes):
+        """
+        unpack payload, strings are decoded as str
+        """
+        return msgpack.unpackb(data, raw=False)
+
+
+class RawCodec:
+
+    def encode(self, message) -> bytes:
+        """
+        message as bytes without any encoding
+        """
+        return bytes(message)
+
+    def decode(self, data: bytes):
+        """
+        payload as is
+        """
+        return data
+
+
+def make_codec(kind: str, proto_class=None):
+    """
+    :param kind: PROTOBUF, JSON, MSGPACK or RAW
+    :param proto_class: protobuf class for PROTOBUF codec
+    :return: new codec
+    """
+    if kind == PROTOBUF:
+        return ProtobufCodec(proto_class)
+    if kind == JSON:
+        return JsonCodec()
+    if kind == MSGPACK:
+        return MsgpackCodec()
+    if kind == RAW:
+        return RawCodec()
+    raise ValueError("unknown codec: {}".format(kind))
+
+
+class CodecStats:
+    __slots__ = ("encoded", "decoded", "raw_bytes", "wire_bytes", "compressed", "encode_time", "decode_time")
+
+    def __init__(self):
+        self.encoded = 0
+        self.decoded = 0
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+        self.compressed = 0
+        self.encode_time = 0.0
+        self.decode_time = 0.0
+
+    def __repr__(self):
+        return "<CodecStats {}>".format(self.as_dict())
+
+    @property
+    def ratio(self) -> float:
+        """
+        :return: wire bytes / raw bytes of encoded msgs, 1.0 without compression
+        """
+        return self.wire_bytes / self.raw_bytes if self.raw_bytes else 1.0
+
+    def as_dict(self) -> dict:
+        """
+        :return: dict of all counters
+        """
+        return {
+            "encoded": self.encoded,
+            "decoded": self.decoded,
+            "raw_bytes": self.raw_bytes,
+            "wire_bytes": self.wire_bytes,
+            "compressed": self.compressed,
+            "ratio": self.ratio,
+            "encode_time": self.encode_time,
+            "decode_time": self.decode_time,
+        }
+
+
+class CodecPipeline:
+
+    def __init__(self, codec, compression=None, threshold=1024, level=6):
+        """
+        :param codec: codec instance with encode/decode
+        :param compression: ZLIB, LZ4 or None for no compression stage (and no marker byte)
+        :param threshold: int, payloads smaller than threshold bytes are sent without compression (with marker byte)
+        :param level: compression level of zlib
+        """
+        if compression not in (None, ZLIB, LZ4):
+            raise ValueError("unknown compression: {}".format(compression))
+        if compression == LZ4 and lz4_frame is None:
+            raise ImportError("lz4 compression needs lz4 package: pip install lz4")
+
+        self.codec = codec
+        self.compression = compression
+        self.threshold = threshold
+        self.level = level
+        self.stats = CodecStats()
+
+    def encode(self, message) -> bytes:
+        """
+        :param message: object for codec or already encoded payload (bytes, bytearray, memoryview)
+        :return: payload for publish
+        """
+        start = time.perf_counter()
+        data = bytes(message) if isinstance(message, RAW_TYPES) else self.codec.encode(message)
+        payload = self._compress(data) if self.compression else data
+
+        stats = self.stats
+        stats.encode_time += time.perf_counter() - start
+        stats.encoded += 1
+        stats.raw_bytes += len(data)
+        stats.wire_bytes += len(payload)
+        return payload
+
+    def decode(self, payload):
+        """
+        :param payload: received payload
+        :return: decoded object
+        """
+        start = time.perf_counter()
+        data = bytes(payload)
+        if self.compression:
+            data = self._decompress(data)
+        message = self.codec.decode(data)
+
+        self.stats.decode_time += time.perf_counter() - start
+        self.stats.decoded += 1
+        return message
+
+    def FromString(self, payload):  # pylint: disable=invalid-name
+        """
+        protobuf class compatible decode, so pipeline can be used instead of protobuf class in CapturedMsg
+        """
+        return self.decode(payload)
+
+    def _compress(self, data: bytes) -> bytes:
+        if len(data) < self.threshold:
+            return bytes((MARKER_PLAIN,)) + data
+        self.stats.compressed += 1
+        if self.compression == ZLIB:
+            return bytes((MARKER_ZLIB,)) + zlib.compress(data, self.level)
+        return bytes((MARKER_LZ4,)) + lz4_frame.compress(data)
+
+    @staticmethod
+    def _decompress(data: bytes) -> bytes:
+        if not data:
+            raise ValueError("compressed payload without marker byte")
+        marker, body = data[0], data[1:]
+        if marker == MARKER_PLAIN:
+            return body
+        if marker == MARKER_ZLIB:
+            return zlib.decompress(body)
+        if marker == MARKER_LZ4:
+            if lz4_frame is None:
+                raise ImportError("lz4 compression needs lz4 package: pip install lz4")
+            return lz4_frame.decompress(body)
+        raise ValueError("unknown compression marker: {}".format(marker))
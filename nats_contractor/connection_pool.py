@@ -0,0 +1,104 @@
+"""
+pool of persistent nats connections for publish and request-respond
+"""
+import asyncio
+import socket
+from nats.aio.client import Client as Nats
+
+
+class NatsConnectionPool:
+
+    def __init__(self, connect_string: str, size=1):
+        """
+        connections are created lazily on first use and reused round robin, broken connection replaced by new one
+
+        :param connect_string: nats uri, example format: nats://0.0.0.0:5644
+        :param size: max count of connections in pool
+        """
+        self.connect_string = connect_string
+        self.size = max(1, int(size))
+
+        self._loop = None
+        self._lock = None
+        self._connections = []
+        self._next = 0
+
+    @property
+    def connections(self) -> list:
+        """
+        :return: list of opened nats connections
+        """
+        return list(self._connections)
+
+    async def get(self, loop=None) -> Nats:
+        """
+        return healthy connection from pool, create it if pool not full yet
+        connections made in other event loop are dropped and closed (they can`t be used from current loop)
+
+        :param loop: asyncio event_loop for new connections
+        :return: connected nats client
+        """
+        if loop is not None and loop is not self._loop:
+            self._drop_connections()
+            self._loop, self._lock = loop, None
+        if self._lock is None:
+            self._lock = asyncio.Lock(loop=self._loop)
+
+        async with self._lock:
+            if len(self._connections) < self.size:
+                nc = await self._connect()
+                self._connections.append(nc)
+                return nc
+
+            index = self._next % len(self._connections)
+            self._next = index + 1
+            nc = self._connections[index]
+            if not self._is_healthy(nc):
+                nc = await self._connect()
+                self._connections[index] = nc
+            return nc
+
+    async def close(self):
+        """
+        close all pool connections
+        """
+        connections, self._connections, self._next = self._connections, [], 0
+        for nc in connections:
+            if not nc.is_closed:
+                await nc.close()
+
+    def _drop_connections(self):
+        """
+        forget connections made in old event loop and close them: close is scheduled in old loop if it is alive
+        (it runs when loop runs again), sockets are shut down if old loop is closed (its tasks never run again)
+        """
+        connections, self._connections, self._next = self._connections, [], 0
+        for nc in connections:
+            if nc.is_closed:
+                continue
+            if self._loop is not None and not self._loop.is_closed():
+                asyncio.ensure_future(nc.close(), loop=self._loop)
+                continue
+            writer = nc._io_writer
+            sock = writer.get_extra_info("socket") if writer is not None else None
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    async def _connect(self) -> Nats:
+        """
+        :return: new connected nats client
+        """
+        nc = Nats()
+        await nc.connect(io_loop=self._loop, servers=[self.connect_string])
+        return nc
+
+    @staticmethod
+    def _is_healthy(nc: Nats) -> bool:
+        """
+        health check, reconnecting client is healthy (it buffers publishes until reconnect)
+        :param nc: nats client
+        """
+        return nc.is_connected or nc.is_reconnecting
@@ -0,0 +1,52 @@
+"""
+expectation of msgs for wait_for, evaluated incrementally in handlers
+"""
+from nats_contractor.subject_trie import is_wildcard, match_subject
+
+
+class MsgExpectation:
+
+    def __init__(self, subject=None, count=1, predicate=None):
+        """
+        :param subject: topic of expected msgs (can contains nats wildcards), None for any topic
+        :param count: int, count of expected msgs
+        :param predicate: callable(msg) -> bool, count only msgs for which it returns True, None for all msgs
+        """
+        self.subject = subject
+        self.count = count
+        self.predicate = predicate
+        self.matched = 0
+        self._wildcard = subject is not None and is_wildcard(subject)
+
+    def __repr__(self):
+        return "<MsgExpectation subject={} matched={}/{}>".format(self.subject, self.matched, self.count)
+
+    @property
+    def satisfied(self) -> bool:
+        """
+        :return: True if expected count of msgs received
+        """
+        return self.matched >= self.count
+
+    def match_subject(self, subject: str) -> bool:
+        """
+        :param subject: topic of received msg
+        :return: True if msg topic is expected
+        """
+        if self._wildcard:
+            return match_subject(self.subject, subject)
+        return self.subject is None or self.subject == subject
+
+    def feed(self, subject: str, msg) -> bool:
+        """
+        check one received msg, called once for every msg
+        :param subject: topic of received msg
+        :param msg: received msg
+        :return: True if msg matched and counted
+        """
+        if not self.match_subject(subject):
+            return False
+        if self.predicate is not None and not self.predicate(msg):
+            return False
+        self.matched += 1
+        return True
@@ -1,135 +1,389 @@
 """
 class for work with nats
 """
+import asyncio
+import time
+from functools import partial
 from nats.aio.errors import ErrTimeout
 from nats.aio.client import Client as Nats
+from nats.aio.utils import new_inbox
+from nats_contractor.captured_msg import CapturedMsg
 from nats_contractor.nats_base_class import NatsBaseQA
+from nats_contractor.responder import Responder
 
 
 class NatsQA(NatsBaseQA):
 
     async def send(self, topic, message):
         """
-        nats publish in new nats connection
+        nats publish in pooled nats connection (or new one if use_pool disabled)
 
         :param topic: nats topic for publish
-        :param message: protobuf class
+        :param message: protobuf class or serialized payload (bytes, bytearray, memoryview)
         """
         try:
-            nc = Nats()
-            await nc.connect(io_loop=self._loop, servers=[self.connect_string])
-            self._logger.info("nats {} > {}".format(topic, message))
-            await nc.publish(topic, message.SerializeToString())
-            await nc.close()
+            nc = await self._get_publisher()
+            self._trace.info(topic, "nats {} > {}", topic, message)
+            await nc.publish(topic, self._payload(message, topic))
+            await self._release_publisher(nc)
         except Exception as e:
             self._logger.error("nats send error: {}".format(e))
 
-    async def start_listen_all(self):
+    async def send_many(self, topic_or_pairs, messages=None) -> list:
+        """
+        nats publish of many msgs in one pooled connection (or new one if use_pool disabled)
+        all msgs serialized first, written in connection pending buffer and flushed once
+
+        :param topic_or_pairs: nats topic for all messages or list of (topic, protobuf or bytes) pairs
+        :param messages: list of protobuf classes or bytes, used with single topic
+        :return: list of (index, exception) for failed msgs, empty if all msgs sent
+        """
+        payloads, failed = self._serialize_pairs(topic_or_pairs, messages)
+        sent = []
+        try:
+            nc = await self._get_publisher()
+            self._logger.info("nats send_many {} msgs".format(len(payloads)))
+            for index, topic, payload in payloads:
+                try:
+                    await nc.publish(topic, payload)
+                    sent.append(index)
+                except Exception as e:
+                    failed.append((index, e))
+
+            try:
+                await nc.flush(self.global_timeout)
+            except Exception as e:
+                failed.extend((index, e) for index in sent)
+            await self._release_publisher(nc)
+        except Exception as e:
+            self._logger.error("nats send_many error: {}".format(e))
+            done = {index for index, _ in failed}.union(sent)
+            failed.extend((index, e) for index, _, _ in payloads if index not in done)
+
+        return sorted(failed, key=lambda fail: fail[0])
+
+    async def start_listen_all(self, queue="use global_queue"):
         """
         subscribe for list of subjects (passing in init) with _total_handle
+        subjects can contains nats wildcards (orders.*, orders.>), msgs of wildcard subject are stored in wildcard topic
+        and in topic of concrete subject
+        all SUB commands are written together and confirmed with one flush
         clear msgs counter, coming in handlers msgs dict and ssids list
         create connect to nats (global for class) only one time, connection can be close only by wait_msgs function
         use wait_msgs function for collect all data coming in nats handler
+        :param queue: nats queue group, workers with same queue share msgs, use default for use global queue from init
         """
         try:
-            await NatsBaseQA.start_listen_all(self)
+            if queue == "use global_queue":
+                queue = self.global_queue
 
-            for subject in self._subjects:
-                self._subjects[subject] = []
-                ssid = await self._nc.subscribe(subject=subject, cb=self._total_handle)
+            if not await NatsBaseQA.start_listen_all(self):
+                return
+
+            subjects = list(self._capture)
+            ssids = await asyncio.gather(
+                *[self._nc.subscribe(subject=subject, queue=queue or "",
+                                     cb=partial(self._total_handle, subscription=subject))
+                  for subject in subjects], loop=self._loop)
+            for subject, ssid in zip(subjects, ssids):
+                self._add_route(subject)
                 self.ssids.append(ssid)
+            await self._nc.flush(self.global_timeout)
         except Exception as e:
             self._logger.error("nats start_listen error: {}".format(e))
 
-    async def start_listen_with_respond(self, topic: str, respond_proto):
+    async def start_listen_with_respond(self, topic: str, respond_proto=None, handler=None, executor=None,
+                                        executor_workers=None, max_in_flight=None, queue="use global_queue"):
         """
         subscribe for nats topic respond_sub
-        clear this topic _subjects
+        clear this topic msgs in capture store
         use wait_msgs function for collect all data coming in nats handler
+        responder counters (received, responded, errors, throughput, latency) are in responder_stats[topic]
         :param topic: topic for subscribe
-        :param respond_proto: protobuf for handler response
+        :param respond_proto: protobuf for handler response, used if handler not set
+        :param handler: sync or async callable(request bytes) -> response protobuf or bytes,
+        for topic with codec handler gets decoded request and response is encoded with codec
+        :param executor: "thread", "process" or concurrent.futures.Executor for run sync handler, None for run in event loop
+        (process executor needs picklable handler, module level function)
+        :param executor_workers: int, count of workers of "thread"/"process" executor, None for default
+        :param max_in_flight: int, max count of requests processed concurrently, None for process one by one in subscription
+        :param queue: nats queue group, responders with same queue share requests, use default for use global queue from init
         """
         try:
+            if queue == "use global_queue":
+                queue = self.global_queue
+
             if not self._nc:
                 self._nc = Nats()
                 await self._nc.connect(io_loop=self._loop, servers=[self.connect_string])
 
+            if isinstance(executor, str):
+                executor = self._get_executor(executor, executor_workers)
+            responder = Responder(respond_proto, handler, executor, self._loop)
+            stats = self.responder_stats[topic] = responder.stats
+            semaphore = asyncio.Semaphore(max_in_flight, loop=self._loop) if max_in_flight else None
+
+            async def respond(msg, start_time):
+                stats.in_flight += 1
+                try:
+                    pipeline = self._codecs.get(msg.subject) if len(self._codecs) else None
+                    if pipeline is None:
+                        response = await responder.response(msg.data)
+                    else:
+                        response = await responder.response(pipeline.decode(msg.data), pipeline.encode)
+                    await self._nc.publish(msg.reply, response)
+                    latency = time.monotonic() - start_time
+                    stats.responded += 1
+                    stats.total_latency += latency
+                    stats.max_latency = max(stats.max_latency, latency)
+                except Exception as ex:
+                    stats.errors += 1
+                    self._trace.error("nats respond_handler", "nats respond_handler error: {}", ex)
+                finally:
+                    stats.in_flight -= 1
+                    if semaphore:
+                        semaphore.release()
+
             async def respond_handler(msg):
+                start_time = time.monotonic()
                 try:
-                    self._logger.info("nats got message, topic: {}".format(msg.subject))
-                    if msg.subject not in self._subjects:
-                        self._subjects[topic] = []
-                    self._subjects[msg.subject].append(msg.data)
-                    self.total_msg += 1
-                    await self._nc.publish(msg.reply, respond_proto.SerializeToString())
+                    self._trace.info(msg.subject, "nats got message, topic: {}", msg.subject)
+                    if msg.subject not in self._capture:
+                        self._capture.add_subject(topic)
+                    item = self._capture_item(msg)
+                    self._store(msg.subject, item)
+                    stats.received += 1
+                    await self._msg_counted(msg.subject, item)
                 except Exception as ex:
-                    self._logger.error("nats respond_handler error: {}".format(ex))
+                    self._trace.error("nats respond_handler", "nats respond_handler error: {}", ex)
+
+                if semaphore:
+                    await semaphore.acquire()
+                    task = asyncio.ensure_future(respond(msg, start_time), loop=self._loop)
+                    self._respond_tasks.add(task)
+                    task.add_done_callback(self._respond_tasks.discard)
+                else:
+                    await respond(msg, start_time)
 
-            self._subjects[topic] = []
-            ssid = await self._nc.subscribe(subject=topic, cb=respond_handler)
+            self._capture.add_subject(topic)
+            ssid = await self._nc.subscribe(subject=topic, queue=queue or "", cb=respond_handler)
             self.ssids.append(ssid)
+            await self._nc.flush(self.global_timeout)
         except Exception as e:
             self._logger.error("nats start_listen error: {}".format(e))
 
-    async def wait_msgs(self, msgs_await=None, timeout=None, add_await=None) -> dict:
+    async def wait_msgs(self, msgs_await=None, timeout=None, add_await=None, settle_idle=None, settle_max=None) -> dict:
         """
         1 wait count msgs in all nats handlers (from subjects and all running start_listen_with_respond topics)
-        2 wait add_await time
-        3 close all connections, unsubscribe all topics
+        2 wait add_await time (or settle until no new msgs for settle_idle time in settle mode)
+        3 close all connections, unsubscribe all topics (not in keep-warm session)
         4 return dict of all msgs coming in nats handlers
         :param msgs_await: int, wait count msgs in all nats handlers, if not set, used global
         :param timeout: float, seconds, timeout for wait count msgs in all nats handlers, if not set, used global
         :param add_await: float, seconds, wait some more time after receive all msgs_await or timeout, if not set, used global
-        :return: _subjects dict, all received msgs, format {"topic_1": [b'received msg 1', b'received msg 2'], ...}
+        :param settle_idle: float, seconds, settle mode idle window used instead of add_await, if not set, used global
+        :param settle_max: float, seconds, hard cap for settle mode wait, if not set, used global
+        :return: subjects dict, all received msgs, format {"topic_1": [b'received msg 1', b'received msg 2'], ...}
         """
         try:
-            await NatsBaseQA.wait_msgs(self, msgs_await, timeout, add_await)
-            for ssid in self.ssids:
-                await self._nc.unsubscribe(ssid)
-
-            await self._nc.close()
-            self._loop, self._nc = None, None
-            return self._subjects
+            await NatsBaseQA.wait_msgs(self, msgs_await, timeout, add_await, settle_idle, settle_max)
+            if not self.keep_alive:
+                await self._close_listener()
+            return self.subjects
         except Exception as e:
             self._logger.error("nats return_msgs error: {}".format(e))
 
-    async def _total_handle(self, msg):
+    async def _close_listener(self):
+        """
+        unsubscribe all topics, wait responses in flight (cancel them after global timeout) and close listener connection
+        """
+        for ssid in self.ssids:
+            await self._nc.unsubscribe(ssid)
+
+        tasks, self._respond_tasks = self._respond_tasks, set()
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=self.global_timeout, loop=self._loop)
+            for task in pending:
+                task.cancel()
+
+        await self._nc.close()
+        self._loop, self._nc = None, None
+        self.ssids = []
+
+    def _capture_item(self, msg):
         """
-        handler for start_listen_all, collect all msgs in _subjects dict and count them
+        :param msg: received nats msg
+        :return: item for capture store, payload bytes or CapturedMsg if capture_records enabled
+        """
+        if not self.capture_records:
+            return msg.data
+        return CapturedMsg(msg.subject, msg.data, msg.reply, time.monotonic_ns(), worker=self.worker_id,
+                           proto_class=self.proto_class(msg.subject))
+
+    async def _total_handle(self, msg, subscription=None):
+        """
+        handler for start_listen_all, collect all msgs in capture store and count them
         :param msg: received msg
+        :param subscription: subscribed topic which delivered msg, None for msg topic
         """
         try:
-            self._logger.info("nats got message, topic: {}".format(msg.subject))
-            self._subjects[msg.subject].append(msg.data)
-            self.total_msg += 1
+            topics = self._route(msg.subject, subscription or msg.subject)
+            if not topics:
+                return
+            self._trace.info(msg.subject, "nats got message, topic: {}", msg.subject)
+            item = self._capture_item(msg)
+            for topic in topics:
+                self._store(topic, item)
+            await self._msg_counted(msg.subject, item)
         except Exception as e:
-            self._logger.error("nats total_handle error: {}".format(e))
+            self._trace.error("nats total_handle", "nats total_handle error: {}", e)
+
+    async def _stream_subscribe(self, subject: str, put):
+        """
+        subscribe topic for stream in pooled nats connection (or new one if use_pool disabled)
+        :param subject: nats topic for subscribe
+        :param put: coroutine function, call it with every received msg
+        :return: (nats connection, ssid)
+        """
+        nc = await self._get_publisher()
+
+        async def stream_handler(msg):
+            await put(self._capture_item(msg))
+
+        ssid = await nc.subscribe(subject=subject, cb=stream_handler)
+        return nc, ssid
+
+    async def _stream_unsubscribe(self, subscription):
+        """
+        unsubscribe stream subscription and release its connection
+        :param subscription: (nats connection, ssid) from _stream_subscribe
+        """
+        nc, ssid = subscription
+        try:
+            if not nc.is_closed:
+                await nc.unsubscribe(ssid)
+            await self._release_publisher(nc)
+        except Exception as e:
+            self._logger.error("nats stream unsubscribe error: {}".format(e))
 
     async def request_respond(self, topic: str, message, timeout=None) -> bytes:
         """
-        nats request-respond in new nats connection
+        nats request-respond in pooled nats connection (or new one if use_pool disabled)
 
         :param topic: nats topic for publish
-        :param message: protobuf class
+        :param message: protobuf class or serialized payload (bytes, bytearray, memoryview)
         :param timeout: float, seconds, timeout for wait count msgs in all nats handlers, if not set, used global
+        :return: response payload as is, it isn`t decoded with codec of topic, use nats.proto_class(topic).FromString
         """
         try:
             if not timeout:
                 timeout = self.global_timeout
 
-            nc = Nats()
-            await nc.connect(io_loop=self._loop, servers=[self.connect_string])
+            nc = await self._get_publisher()
 
             try:
-                self._logger.info("nats {} > {}".format(topic, message))
-                resp = await nc.timed_request(topic, message.SerializeToString(), timeout)
+                self._trace.info(topic, "nats {} > {}", topic, message)
+                resp = await nc.timed_request(topic, self._payload(message, topic), timeout)
                 response = resp.data
-                self._logger.info("nats {} response < {}".format(topic, response))
+                self._trace.info(topic, "nats {} response < {}", topic, response)
             except ErrTimeout:
                 response = TimeoutError
                 self._logger.error("nats request_respond timeout")
 
-            await nc.close()
+            await self._release_publisher(nc)
             return response
         except Exception as e:
             self._logger.error("nats request_respond error: {}".format(e))
+
+    async def request_many(self, topic: str, messages: list, concurrency=100, timeout=None) -> list:
+        """
+        nats request-respond of many msgs in one pooled connection (or new one if use_pool disabled)
+        requests are sent concurrently through one wildcard inbox subscription of connection (reply token correlation)
+
+        :param topic: nats topic for publish
+        :param messages: list of protobuf classes or bytes
+        :param concurrency: int, max count of requests waiting response
+        :param timeout: float, seconds, timeout for wait response of every request, if not set, used global
+        :return: list of responses bytes in order of messages (not decoded with codec of topic),
+        TimeoutError for request without response, exception for failed request
+        """
+        if not timeout:
+            timeout = self.global_timeout
+
+        payloads, failed = self._serialize_pairs(topic, messages)
+        responses = [None] * len(messages)
+        for index, e in failed:
+            responses[index] = e
+
+        try:
+            nc = await self._get_publisher()
+            semaphore = asyncio.Semaphore(concurrency, loop=self._loop)
+
+            async def request(index, subject, payload):
+                async with semaphore:
+                    try:
+                        resp = await nc.request(subject, payload, timeout)
+                        responses[index] = resp.data
+                    except ErrTimeout:
+                        responses[index] = TimeoutError
+                    except Exception as ex:
+                        responses[index] = ex
+
+            self._logger.info("nats request_many {} > {} msgs".format(topic, len(payloads)))
+            await asyncio.gather(*[request(*payload) for payload in payloads], loop=self._loop)
+            await self._release_publisher(nc)
+        except Exception as e:
+            self._logger.error("nats request_many error: {}".format(e))
+            for index, _, _ in payloads:
+                if responses[index] is None:
+                    responses[index] = e
+        return responses
+
+    async def request_gather(self, topic: str, message, max_replies=None, window=None):
+        """
+        nats request to topic with many responders, publish once with private inbox and yield replies as they arrive
+        stop when max_replies received (without waiting rest of window) or window passed
+        replies are payloads as is, they aren`t decoded with codec of topic
+        example: replies = [reply async for reply in nats.request_gather("topic", proto, max_replies=3, window=1)]
+
+        :param topic: nats topic for publish
+        :param message: protobuf class or serialized payload (bytes, bytearray, memoryview)
+        :param max_replies: int, stop after max_replies replies, None for collect all replies in window
+        :param window: float, seconds, max time for collect replies, if not set, used global timeout
+        """
+        if not window:
+            window = self.global_timeout
+
+        nc = await self._get_publisher()
+        queue = asyncio.Queue(loop=self._loop)
+        inbox = new_inbox()
+
+        async def gather_handler(msg):
+            await queue.put(msg.data)
+
+        ssid = await nc.subscribe(inbox, cb=gather_handler)
+        try:
+            if max_replies:
+                await nc.auto_unsubscribe(ssid, max_replies)
+            self._trace.info(topic, "nats {} gather > {}", topic, message)
+            await nc.publish_request(topic, inbox, self._payload(message, topic))
+
+            deadline = time.monotonic() + float(window)
+            received = 0
+            while max_replies is None or received < max_replies:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    reply = await asyncio.wait_for(queue.get(), remaining, loop=self._loop)
+                except asyncio.TimeoutError:
+                    break
+                received += 1
+                yield reply
+        finally:
+            try:
+                if not nc.is_closed:
+                    await nc.unsubscribe(ssid)
+                await self._release_publisher(nc)
+            except Exception as e:
+                self._logger.error("nats request_gather error: {}".format(e))
@@ -2,14 +2,31 @@
 abstract base class for work with nats and nats-streaming
 """
 import asyncio
+import os
+import socket
 import time
+import weakref
 from abc import ABC, abstractmethod
 from nats.aio.client import Client as Nats
+from nats_contractor.capture_index import CaptureIndex, field_value
+from nats_contractor.codec import PROTOBUF, CodecPipeline, make_codec
+from nats_contractor.capture_store import CaptureStore
+from nats_contractor.captured_msg import CapturedMsg
+from nats_contractor.connection_pool import NatsConnectionPool
+from nats_contractor.expectation import MsgExpectation
+from nats_contractor.proto_registry import DecodedView
+from nats_contractor.responder import make_executor
+from nats_contractor.serialize_cache import SerializeCache, to_payload
+from nats_contractor.subject_trie import SubjectRegistry, SubjectTrie, is_wildcard
+from nats_contractor.tracer import Tracer
 
 
 class NatsBaseQA(ABC):
 
-    def __init__(self, logger, subjects: list, connect_string: str, nats_timeout=2, add_await=0.1, msgs_await=0):
+    def __init__(self, logger, subjects: list, connect_string: str, nats_timeout=2, add_await=0.1, msgs_await=0,
+                 pool_size=1, use_pool=True, settle_idle=None, settle_max=1.0, capture_store=None,
+                 capture_records=False, queue=None, worker_id=None, serialize_cache_size=0,
+                 serialize_trust_identity=False, log_sample_rate=1.0, log_max_payload=256, log_error_interval=1.0):
         """
         base init inherited in nats and override in nats-streaming
 
@@ -20,21 +37,64 @@ class NatsBaseQA(ABC):
         :param add_await: simple global wait after receive all planning msgs or timeout (used if local add_await don`t set),
         u can set local add_await directly in function
         :param msgs_await: global total msgs count waiting until timeout in handlers, u can set local msgs_await directly in function
+        :param pool_size: count of persistent nats connections used by send and request_respond
+        :param use_pool: use persistent connections pool, set False for new nats connection in every send/request_respond
+        :param settle_idle: global settle mode for wait_msgs, instead of add_await wait until no new msgs for settle_idle seconds,
+        None for fixed add_await wait, u can set local settle_idle directly in function
+        :param settle_max: global hard cap in seconds for settle mode wait, u can set local settle_max directly in function
+        :param capture_store: storage for msgs received in handlers (CaptureStore or RingCaptureStore), None for unbounded
+        :param capture_records: store CapturedMsg records (payload with topic, reply, arrival time, stan sequence)
+        instead of payload bytes
+        :param queue: global queue group for subscriptions, workers with same queue share msgs of topic,
+        None for receive all msgs in every worker, u can set local queue directly in function
+        :param worker_id: id of this worker in CapturedMsg records, None for hostname-pid
+        :param serialize_cache_size: max count of protobufs with cached serialized payload, 0 for serialize every send
+        :param serialize_trust_identity: if True, cached payload is used for the same protobuf object without check of
+        its content, don`t change template protobuf after send in this mode
+        :param log_sample_rate: float from 0 to 1, part of sent and received msgs which are logged, set rate of subject
+        with set_log_sample_rate
+        :param log_max_payload: max count of chars of logged msg, longer msgs are truncated, None for unlimited
+        :param log_error_interval: seconds, same handler error is logged not more than once per interval
         """
         self._loop, self._nc = None, None
         self.ssids = []
+        self.keep_alive = False
         self.total_msg = 0
+        self._subject_counts = {}
+        self._expectations = weakref.WeakSet()
+        self._msg_condition, self._msg_condition_loop = None, None
+        self._last_msg_time, self._subject_last_time = None, {}
 
         self.connect_string = connect_string
         self.global_timeout = nats_timeout
         self.global_add_wait = add_await
         self.global_msgs_await = msgs_await
+        self.global_settle_idle = settle_idle
+        self.global_settle_max = settle_max
+        self.global_queue = queue
+        self.worker_id = worker_id or "{}-{}".format(socket.gethostname(), os.getpid())
         self._logger = logger
+        self._trace = Tracer(logger, log_sample_rate, log_max_payload, log_error_interval)
+
+        self.use_pool = use_pool
+        self._pool = NatsConnectionPool(connect_string, pool_size)
 
         self.__subjects_list = subjects
-        self._subjects = {}
-        for subj in subjects:
-            self._subjects[subj] = []
+        self._capture = capture_store if capture_store is not None else CaptureStore()
+        self._capture.clear(subjects)
+        self.capture_records = capture_records
+        self._routes = SubjectTrie()
+        self.responder_stats = {}
+        self.stream_dropped = {}
+        self._respond_tasks = set()
+        self._executors = {}
+        self._protos = SubjectRegistry()
+        self._codecs = SubjectRegistry()
+        self._codec_pipelines = {}
+        self._decode_cache = {}
+        self._index = CaptureIndex(self._proto_of)
+        self._serialize_cache = SerializeCache(serialize_cache_size, serialize_trust_identity) \
+            if serialize_cache_size else None
 
     @property
     def loop(self):
@@ -55,7 +115,7 @@ class NatsBaseQA(ABC):
         """
         :return: subjects: dict with all msgs received in nats handlers
         """
-        return self._subjects
+        return self._capture.snapshot()
 
     @subjects.setter
     def subjects(self, subjects: dict):
@@ -63,7 +123,148 @@ class NatsBaseQA(ABC):
         use for clear subjects, necessary if subscribe with start_listen_with_respond on different topics
         :param subjects: dict with all msgs received in nats handlers
         """
-        self._subjects = subjects
+        self._capture.load(subjects)
+        self._decode_cache = {}
+        self._index.clear()
+
+    @property
+    def capture_store(self) -> CaptureStore:
+        """
+        :return: storage of msgs received in nats handlers
+        """
+        return self._capture
+
+    def set_log_sample_rate(self, subject: str, rate: float):
+        """
+        :param subject: nats subject, can contains wildcards
+        :param rate: float from 0 to 1, part of sent and received msgs of subject which are logged, 0 for don`t log
+        """
+        self._trace.set_sample_rate(subject, rate)
+
+    @property
+    def serialize_cache(self) -> SerializeCache:
+        """
+        :return: cache of serialized payloads, None if it is disabled
+        """
+        return self._serialize_cache
+
+    async def __aenter__(self):
+        """
+        keep-warm session: connections and subscriptions of start_listen_all stay alive until exit,
+        wait_msgs don`t close them and start_listen_all only reset captures
+        example: async with nats: (in each test) await nats.start_listen_all() ... await nats.wait_msgs(msgs_await=1)
+        """
+        self.keep_alive = True
+        await self.start_listen_all()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def reset(self):
+        """
+        clear received msgs (topics stay in capture store), msgs counters and expectations without reconnect
+        """
+        self.total_msg = 0
+        self._subject_counts = {}
+        self._expectations = weakref.WeakSet()
+        self._last_msg_time, self._subject_last_time = None, {}
+        self._capture.clear(list(self._capture))
+        self._decode_cache = {}
+        self._index.clear()
+
+    async def close(self):
+        """
+        finish keep-warm session: unsubscribe all topics, close listener connections and connections pool
+        """
+        self.keep_alive = False
+        try:
+            if self._nc:
+                await self._close_listener()
+        finally:
+            await self.close_pool()
+            executors, self._executors = self._executors, {}
+            for executor in executors.values():
+                executor.shutdown(wait=False)
+            self._trace.flush()
+
+    @abstractmethod
+    async def _close_listener(self):
+        """
+        unsubscribe all topics and close listener connections
+        """
+
+    def _get_executor(self, kind: str, workers=None):
+        """
+        executor shared by responders, it is shut down by close
+        :param kind: "thread" or "process"
+        :param workers: int, count of workers, None for default of executor
+        :return: concurrent.futures.Executor
+        """
+        key = kind, workers
+        if key not in self._executors:
+            self._executors[key] = make_executor(kind, workers)
+        return self._executors[key]
+
+    async def close_pool(self):
+        """
+        close all persistent connections of send/request_respond pool, use it on tests teardown
+        """
+        await self._pool.close()
+
+    async def _get_publisher(self) -> Nats:
+        """
+        :return: nats connection for publish, from pool or new one (closed by _release_publisher) if pool disabled
+        """
+        if self.use_pool:
+            return await self._pool.get(self._loop)
+
+        nc = Nats()
+        await nc.connect(io_loop=self._loop, servers=[self.connect_string])
+        return nc
+
+    async def _release_publisher(self, nc: Nats):
+        """
+        close connection got from _get_publisher if it not from pool
+        :param nc: nats connection
+        """
+        if not self.use_pool:
+            await nc.close()
+
+    def _payload(self, message, topic=None) -> bytes:
+        """
+        :param message: protobuf or already serialized payload (bytes, bytearray, memoryview)
+        :param topic: topic of msg, msg is encoded with codec registered for topic
+        :return: payload bytes, from serialize cache if it is enabled
+        """
+        if topic is not None and len(self._codecs):
+            pipeline = self._codecs.get(topic)
+            if pipeline is not None:
+                return pipeline.encode(message)
+        if self._serialize_cache is not None:
+            return self._serialize_cache.payload(message)
+        return to_payload(message)
+
+    def _serialize_pairs(self, topic_or_pairs, messages=None):
+        """
+        serialize all msgs for batch publish before write anything in connection
+
+        :param topic_or_pairs: topic for all messages or list of (topic, protobuf or bytes) pairs
+        :param messages: list of protobuf classes or bytes, used with single topic
+        :return: list of (index, topic, bytes) ready for publish, list of (index, exception) for failed msgs
+        """
+        if isinstance(topic_or_pairs, str):
+            pairs = [(topic_or_pairs, message) for message in messages or []]
+        else:
+            pairs = list(topic_or_pairs)
+
+        payloads, failed = [], []
+        for index, (topic, message) in enumerate(pairs):
+            try:
+                payloads.append((index, topic, self._payload(message, topic)))
+            except Exception as e:
+                failed.append((index, e))
+        return payloads, failed
 
     @abstractmethod
     async def send(self, topic: str, message):
@@ -74,6 +275,16 @@ class NatsBaseQA(ABC):
         :param message: protobuf class
         """
 
+    @abstractmethod
+    async def send_many(self, topic_or_pairs, messages=None) -> list:
+        """
+        nats/stan publish of many msgs in one connection
+
+        :param topic_or_pairs: nats/stan topic for all messages or list of (topic, protobuf) pairs
+        :param messages: list of protobuf classes, used with single topic
+        :return: list of (index, exception) for failed msgs, empty if all msgs sent
+        """
+
     @abstractmethod
     async def start_listen_all(self):
         """
@@ -81,28 +292,40 @@ class NatsBaseQA(ABC):
         clear msgs counter, coming in handlers msgs dict and ssids list
         create connect to nats (global for class) only one time, connection can be close only by wait_msgs function
         use wait_msgs function for collect all data coming in nats handler
+        :return: False if it is keep-warm session with alive subscriptions (only captures reset), True for new subscribe
         """
+        if self.keep_alive and self.ssids and self._nc and self._nc.is_connected:
+            self.reset()
+            return False
+
         self.ssids = []
         self.total_msg = 0
-        self._subjects = {}
-        for subj in self.__subjects_list:
-            self._subjects[subj] = []
+        self._subject_counts = {}
+        self._expectations = weakref.WeakSet()
+        self._last_msg_time, self._subject_last_time = None, {}
+        self._capture.clear(self.__subjects_list)
+        self._routes.clear()
+        self._decode_cache = {}
+        self._index.clear()
 
         if not self._nc:
             self._nc = Nats()
             await self._nc.connect(io_loop=self._loop, servers=[self.connect_string])
+        return True
 
     @abstractmethod
-    async def wait_msgs(self, msgs_await=None, timeout=None, add_await=None):
+    async def wait_msgs(self, msgs_await=None, timeout=None, add_await=None, settle_idle=None, settle_max=None):
         """
         1 wait count msgs in all nats handlers (from subjects and all running start_listen_with_respond topics)
-        2 wait add_await time
-        3 close all connections, unsubscribe all topics
+        2 wait add_await time (or settle until no new msgs for settle_idle time in settle mode)
+        3 close all connections, unsubscribe all topics (not in keep-warm session)
         4 return dict of all msgs coming in nats handlers
         :param msgs_await: int, wait count msgs in all nats handlers, if not set, used global
         :param timeout: float, seconds, timeout for wait count msgs in all nats handlers, if not set, used global
         :param add_await: float, seconds, wait some more time after receive all msgs_await or timeout, if not set, used global
-        :return: _subjects dict, all received msgs, format {"topic_1": [b'received msg 1', b'received msg 2'], ...}
+        :param settle_idle: float, seconds, settle mode idle window used instead of add_await, if not set, used global
+        :param settle_max: float, seconds, hard cap for settle mode wait, if not set, used global
+        :return: subjects dict, all received msgs, format {"topic_1": [b'received msg 1', b'received msg 2'], ...}
         """
         if not self._nc:
             raise UnboundLocalError("nats connection don`t exist")
@@ -113,19 +336,396 @@ class NatsBaseQA(ABC):
             timeout = self.global_timeout
         if not add_await:
             add_await = self.global_add_wait
+        if not settle_idle:
+            settle_idle = self.global_settle_idle
+
+        condition = self._get_msg_condition()
+
+        async def wait_count():
+            async with condition:
+                await condition.wait_for(lambda: self.total_msg >= msgs_await)
+
+        start_time = time.monotonic()
+        try:
+            await asyncio.wait_for(wait_count(), float(timeout), loop=self._loop)
+        except asyncio.TimeoutError:
+            self._logger.error("nats_base wait_msgs timeout, got {} of {} msgs in {:.3f} s".format(
+                self.total_msg, msgs_await, time.monotonic() - start_time))
+
+        if settle_idle:
+            await self.settle(settle_idle, settle_max)
+        else:
+            await asyncio.sleep(add_await, loop=self._loop)
+
+    async def settle(self, idle=None, max_wait=None, subjects=None) -> float:
+        """
+        wait until no new msg arrived on watched topics for idle seconds, but no longer than max_wait
+        idle window is counted from last msg arrival time recorded in handlers (or from settle start if no msgs yet)
+
+        :param idle: float, seconds, idle window, if not set, used global settle_idle (or add_await)
+        :param max_wait: float, seconds, hard cap of wait, if not set, used global settle_max
+        :param subjects: list of watched topics, None for all topics
+        :return: float, seconds spent in settle
+        """
+        idle = float(idle or self.global_settle_idle or self.global_add_wait)
+        max_wait = float(max_wait or self.global_settle_max)
+
+        start_time = time.monotonic()
+        deadline = start_time + max_wait
+        while True:
+            if subjects is None:
+                last_time = self._last_msg_time
+            else:
+                last_time = max((self._subject_last_time[subj] for subj in subjects if subj in self._subject_last_time),
+                                default=None)
+
+            now = time.monotonic()
+            quiet_until = (last_time or start_time) + idle
+            if now >= quiet_until or now >= deadline:
+                return now - start_time
+            await asyncio.sleep(min(quiet_until, deadline) - now, loop=self._loop)
+
+    async def stream(self, subject: str, max_msgs=None, timeout=None, maxsize=1000, drop_when_full=False):
+        """
+        async iterator over msgs of topic as they arrive, msgs aren`t stored in subjects and don`t count in wait_msgs
+        subscription has own bounded queue with backpressure: if queue is full, handler of this subscription waits
+        consumer (client delivers msgs of every subscription in own task, so other subscriptions aren`t blocked)
+        example: async for msg in nats.stream("topic", max_msgs=10): ...
+
+        :param subject: nats/stan topic for subscribe
+        :param max_msgs: int, stop iteration after max_msgs msgs, None for unlimited
+        :param timeout: float, seconds, stop iteration if no new msg during timeout, if not set, used global
+        :param maxsize: int, max count of msgs in queue between subscription and consumer
+        :param drop_when_full: if True, handler doesn`t wait consumer, new msg is dropped if queue is full,
+        dropped msgs are counted in stream_dropped[subject]
+        """
+        if not timeout:
+            timeout = self.global_timeout
+
+        queue = asyncio.Queue(maxsize=maxsize, loop=self._loop)
+
+        async def put(msg):
+            if not drop_when_full:
+                await queue.put(msg)
+                return
+            try:
+                queue.put_nowait(msg)
+            except asyncio.QueueFull:
+                self.stream_dropped[subject] = self.stream_dropped.get(subject, 0) + 1
+                self._trace.error("nats_base stream", "nats_base stream {} queue is full, msg dropped", subject)
+
+        subscription = await self._stream_subscribe(subject, put)
+        received = 0
+        try:
+            while max_msgs is None or received < max_msgs:
+                try:
+                    msg = await asyncio.wait_for(queue.get(), float(timeout), loop=self._loop)
+                except asyncio.TimeoutError:
+                    break
+                received += 1
+                yield msg
+        finally:
+            await self._stream_unsubscribe(subscription)
+
+    @abstractmethod
+    async def _stream_subscribe(self, subject: str, put):
+        """
+        subscribe topic for stream
+        :param subject: nats/stan topic for subscribe
+        :param put: coroutine function, call it with every received msg
+        :return: subscription passed to _stream_unsubscribe
+        """
+
+    @abstractmethod
+    async def _stream_unsubscribe(self, subscription):
+        """
+        unsubscribe stream subscription and release its connections
+        :param subscription: subscription from _stream_subscribe
+        """
+
+    def register_proto(self, subject: str, proto_class):
+        """
+        set protobuf class for decode msgs of subject in decoded and CapturedMsg.proto
+        :param subject: nats subject, can contains wildcards, first registered pattern wins if several patterns match,
+        class of already registered pattern is replaced and msgs decoded with old one are dropped from caches
+        :param proto_class: protobuf class
+        """
+        self._protos.register(subject, proto_class)
+        self._decode_cache = {}
+        self._index.clear()
+
+    def proto_class(self, subject: str):
+        """
+        :param subject: concrete subject
+        :return: codec pipeline or protobuf class registered for subject (both have FromString) or None
+        """
+        if len(self._codecs):
+            pipeline = self._codecs.get(subject)
+            if pipeline is not None:
+                return pipeline
+        return self._protos.get(subject) if len(self._protos) else None
+
+    def register_codec(self, subject: str, codec=PROTOBUF, proto_class=None, compression=None,
+                       compress_threshold=1024) -> CodecPipeline:
+        """
+        set codec for encode msgs of subject on send and decode received msgs in decoded, find and CapturedMsg.proto
+        :param subject: nats subject, can contains wildcards, first registered pattern wins if several patterns match,
+        codec of already registered pattern is replaced (with its stats)
+        :param codec: "protobuf", "json", "msgpack" (needs msgpack package) or "raw"
+        :param proto_class: protobuf class for protobuf codec, None for class registered with register_proto,
+        ValueError if it isn`t registered too
+        :param compression: "zlib", "lz4" (needs lz4 package) or None, compressed payload starts with marker byte,
+        so all senders and receivers of subject must use the same codec
+        :param compress_threshold: int, payloads smaller than threshold bytes are not compressed
+        :return: codec pipeline, its stats has counters of bytes and encode/decode time
+        """
+        if codec == PROTOBUF and proto_class is None:
+            proto_class = self._protos.get(subject)
+            if proto_class is None:
+                raise ValueError("protobuf codec of subject {} needs proto_class or register_proto".format(subject))
+        pipeline = CodecPipeline(make_codec(codec, proto_class), compression, compress_threshold)
+        self._codecs.register(subject, pipeline)
+        self._codec_pipelines[subject] = pipeline
+        self._decode_cache = {}
+        self._index.clear()
+        return pipeline
+
+    def codec_stats(self) -> dict:
+        """
+        :return: dict of registered subject -> dict of codec counters (encoded, decoded, raw_bytes, wire_bytes,
+        compressed, ratio, encode_time, decode_time)
+        """
+        return {subject: pipeline.stats.as_dict() for subject, pipeline in self._codec_pipelines.items()}
+
+    def decoded(self, subject: str) -> DecodedView:
+        """
+        lazy view of received msgs of subject decoded with registered protobuf class,
+        every msg is decoded on first access and cached, so next views and assertions don`t parse it again
+        :param subject: topic in capture store
+        :return: sequence of protobufs
+        """
+        proto_class = self.proto_class(subject)
+        if proto_class is None:
+            raise ValueError("protobuf class or codec isn`t registered for subject {}".format(subject))
+        items = list(self._capture.get(subject))
+        cache = self._decode_cache.setdefault(subject, {})
+        if len(cache) > 2 * len(items):
+            alive = {id(item) for item in items}
+            for key in [key for key in cache if key not in alive]:
+                del cache[key]
+
+        def decode(item):
+            if isinstance(item, CapturedMsg):
+                if item.proto_class is None:
+                    item.proto_class = proto_class
+                return item.proto
+            cached = cache.get(id(item))
+            if cached is None or cached[0] is not item:
+                cached = cache[id(item)] = item, proto_class.FromString(bytes(item))
+            return cached[1]
+
+        return DecodedView(items, decode)
+
+    def _proto_of(self, subject: str, item):
+        """
+        :param subject: topic in capture store
+        :param item: captured item (payload bytes or CapturedMsg)
+        :return: item decoded with protobuf class registered for topic
+        """
+        if isinstance(item, CapturedMsg):
+            if item.proto_class is None:
+                item.proto_class = self.proto_class(subject)
+            return item.proto
+        proto_class = self.proto_class(subject)
+        if proto_class is None:
+            raise ValueError("protobuf class isn`t registered for subject {}".format(subject))
+        return proto_class.FromString(bytes(item))
+
+    def find(self, subject: str, **field_equals) -> list:
+        """
+        find received msgs of subject by protobuf fields values with hash indexes,
+        index of field is built on first query and updated on every new msg, so next queries don`t parse msgs
+        :param subject: topic in capture store, protobuf class must be registered with register_proto
+        :param field_equals: field=value conditions, nested field as order__id for order.id
+        :return: list of protobufs matched all conditions, in arrival order
+        """
+        items = self._capture.get(subject)
+        if not field_equals:
+            return [self._proto_of(subject, item) for item in items]
+        conditions = [(field.replace("__", "."), value) for field, value in field_equals.items()]
+        candidates = min((self._index.lookup(subject, field, value, items) for field, value in conditions), key=len)
+        return [proto for proto in candidates
+                if all(field_value(proto, field) == value for field, value in conditions)]
+
+    def count_where(self, subject: str, **field_equals) -> int:
+        """
+        :param subject: topic in capture store
+        :param field_equals: field=value conditions, see find
+        :return: count of received msgs matched all conditions
+        """
+        return len(self.find(subject, **field_equals))
+
+    def group_by(self, subject: str, field: str) -> dict:
+        """
+        :param subject: topic in capture store
+        :param field: protobuf field, nested fields are separated with dot: "order.id"
+        :return: dict of field value -> list of protobufs, in arrival order
+        """
+        return self._index.groups(subject, field, self._capture.get(subject))
+
+    def _store(self, subject: str, item):
+        """
+        put item in capture store and in field indexes of topic
+        :param subject: topic in capture store
+        :param item: captured item
+        """
+        if self._capture.append(subject, item):
+            try:
+                self._index.append(subject, item)
+            except Exception as e:
+                self._trace.error("nats_base index", "nats_base index {} error: {}", subject, e)
+
+    def expect(self, subject=None, count=1, predicate=None) -> MsgExpectation:
+        """
+        register expectation checked in handlers for every new msg, already received msgs are counted on register
+        use it before send for wait_for with predicate without scan of received msgs
+        expectation is checked while u keep reference to it or until wait_for with it returns
+
+        :param subject: topic of expected msgs, None for any topic
+        :param count: int, count of expected msgs
+        :param predicate: callable(msg) -> bool, count only msgs for which it returns True, None for all msgs
+        :return: MsgExpectation, pass it to wait_for
+        """
+        expectation = MsgExpectation(subject, count, predicate)
+        if predicate is None:
+            expectation.matched = sum(count for subj, count in self._subject_counts.items()
+                                      if expectation.match_subject(subj))
+        else:
+            for subj, msgs in self._capture.items():
+                # wildcard topics msgs are also stored in concrete topics
+                if not is_wildcard(subj) and expectation.match_subject(subj):
+                    for msg in msgs:
+                        self._feed_expectation(expectation, subj, msg)
+
+        self._expectations.add(expectation)
+        return expectation
 
-        start_time = time.time()
-        while self.total_msg < msgs_await:
-            if time.time() - start_time > float(timeout):
-                self._logger.error("nats_base wait_msgs timeout")
-                break
-            await asyncio.sleep(0.001, loop=self._loop)
+    async def wait_for(self, subject=None, count=None, predicate=None, expectations=None, timeout=None) -> bool:
+        """
+        wait until all expectations satisfied or timeout, connections stay opened (use wait_msgs for close them)
+        example: await nats.wait_for(expectations=[nats.expect("topic_1", 2), {"subject": "topic_2", "predicate": f}])
+
+        :param subject: topic of expected msgs, None for any topic
+        :param count: int, count of expected msgs, None for 1 (without expectations)
+        :param predicate: callable(msg) -> bool, count only msgs for which it returns True, None for all msgs
+        :param expectations: list of MsgExpectation (from expect) or dicts with expect kwargs, waited together with
+        subject/count/predicate expectation if subject, count or predicate set
+        all waited expectations are unregistered after return
+        :param timeout: float, seconds, timeout for wait all expectations, if not set, used global
+        :return: True if all expectations satisfied, False on timeout
+        """
+        if not timeout:
+            timeout = self.global_timeout
+
+        waiting = []
+        for expectation in expectations or []:
+            if isinstance(expectation, dict):
+                expectation = self.expect(**expectation)
+            waiting.append(expectation)
+        if not waiting or subject is not None or count is not None or predicate is not None:
+            waiting.append(self.expect(subject, 1 if count is None else count, predicate))
+
+        condition = self._get_msg_condition()
+
+        async def wait_all():
+            async with condition:
+                await condition.wait_for(lambda: all(expectation.satisfied for expectation in waiting))
+
+        try:
+            await asyncio.wait_for(wait_all(), float(timeout), loop=self._loop)
+            return True
+        except asyncio.TimeoutError:
+            self._logger.error("nats_base wait_for timeout, expectations: {}".format(waiting))
+            return False
+        finally:
+            for expectation in waiting:
+                self._expectations.discard(expectation)
+
+    def _feed_expectation(self, expectation: MsgExpectation, subject: str, msg):
+        """
+        check msg with expectation, errors of predicate are logged (rate-limited) and msg isn`t counted
+        """
+        try:
+            expectation.feed(subject, msg)
+        except Exception as e:
+            self._trace.error("nats_base expectation", "nats_base expectation predicate error: {}", e)
 
-        await asyncio.sleep(add_await, loop=self._loop)
+    def _add_route(self, subject: str):
+        """
+        register subscription of start_listen_all for routing received msgs with _route
+        :param subject: subscribed topic, can contains nats wildcards
+        """
+        self._routes.insert(subject, (len(self._routes), subject))
+
+    def _route(self, subject: str, subscription: str) -> list:
+        """
+        topics of capture store for msg of start_listen_all subscriptions
+        msg of wildcard subscription is stored in wildcard topic and in concrete topic (created on first msg)
+        if msg matches several subscriptions it is processed only once, from first subscribed of them
+
+        :param subject: concrete topic of received msg
+        :param subscription: subscribed topic which delivered msg
+        :return: list of topics, empty for duplicate msg of other matched subscription
+        """
+        matched = self._routes.match(subject)
+        if not matched or (len(matched) == 1 and matched[0][1] == subject):
+            return [subject]
+        if min(matched)[1] != subscription:
+            return []
+
+        topics = [topic for _, topic in sorted(matched)]
+        if subject not in topics:
+            if subject not in self._capture:
+                self._capture.add_subject(subject)
+            topics.append(subject)
+        return topics
+
+    def _get_msg_condition(self) -> asyncio.Condition:
+        """
+        :return: condition notified by handlers on every counted msg, created for current event loop
+        """
+        loop = self._loop or asyncio.get_event_loop()
+        if self._msg_condition is None or self._msg_condition_loop is not loop:
+            self._msg_condition, self._msg_condition_loop = asyncio.Condition(loop=loop), loop
+        return self._msg_condition
+
+    async def _msg_counted(self, subject: str, msg):
+        """
+        count received msg, check it with active expectations and wake up waiters, call it from every handler
+        :param subject: topic of received msg
+        :param msg: received msg stored in capture store
+        """
+        self.total_msg += 1
+        self._subject_counts[subject] = self._subject_counts.get(subject, 0) + 1
+        self._last_msg_time = self._subject_last_time[subject] = time.monotonic()
+        for expectation in list(self._expectations):
+            if not expectation.satisfied:
+                self._feed_expectation(expectation, subject, msg)
+
+        condition = self._get_msg_condition()
+        async with condition:
+            condition.notify_all()
+
+    @abstractmethod
+    def _capture_item(self, msg):
+        """
+        :param msg: received nats/stan msg
+        :return: item for capture store, payload bytes or CapturedMsg if capture_records enabled
+        """
 
     @abstractmethod
     async def _total_handle(self, msg):
         """
-        handler for start_listen_all, collect all msgs in _subjects dict and count them
+        handler for start_listen_all, collect all msgs in capture store and count them
         :param msg: received msg
         """
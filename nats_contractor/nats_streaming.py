@@ -1,16 +1,26 @@
 """
 class for work with nats-streaming
 """
+import asyncio
 import datetime
+import time
+import uuid
 from nats.aio.client import Client as Nats
 from stan.aio.client import Client as Stan
+from stan.aio.errors import StanError
+from nats_contractor.captured_msg import CapturedMsg
 from nats_contractor.nats_base_class import NatsBaseQA
+from nats_contractor.sequence_tracker import SequenceTracker
 
 
 class NatsStreamingQA(NatsBaseQA):
 
     def __init__(self, logger, subjects, connect_string, nats_timeout=2, add_await=0.1, msgs_await=0,
-                 durable_name="durable_name", cluster_name="test-cluster"):
+                 durable_name="durable_name", cluster_name="test-cluster", settle_idle=None,
+                 settle_max=1.0, capture_store=None, capture_records=False, subscribe_concurrency=32, queue=None,
+                 worker_id=None, max_pub_in_flight=1024, dedupe=False, client_id_prefix="qa",
+                 serialize_cache_size=0, serialize_trust_identity=False, log_sample_rate=1.0, log_max_payload=256,
+                 log_error_interval=1.0):
         """
         :param logger: logger class instance
         :param subjects: list of stan topics for subscribe in start_listen_all with _total_handle for all
@@ -21,99 +31,642 @@ class NatsStreamingQA(NatsBaseQA):
         :param msgs_await: global total msgs count waiting until timeout in handlers, u can set local msgs_await directly in function
         :param durable_name: global stan subscription durable_name, u can set local durable_name directly in function
         :param cluster_name: stan cluster name, use test-cluster for docker nats-streaming
+        :param settle_idle: global settle mode for wait_msgs, instead of add_await wait until no new msgs for settle_idle seconds,
+        None for fixed add_await wait, u can set local settle_idle directly in function
+        :param settle_max: global hard cap in seconds for settle mode wait, u can set local settle_max directly in function
+        :param capture_store: storage for msgs received in handlers (CaptureStore or RingCaptureStore), None for unbounded
+        :param capture_records: store CapturedMsg records (payload with topic, arrival time, stan sequence and timestamp)
+        instead of payload bytes
+        :param subscribe_concurrency: max count of stan subscription requests in flight in start_listen_all
+        :param queue: global stan queue group (durable queue subscription with durable_name), workers with same queue
+        share msgs of channel, None for receive all msgs in every worker, u can set local queue directly in function
+        :param worker_id: id of this worker in CapturedMsg records, None for hostname-pid
+        :param max_pub_in_flight: max count of publish_async and send_many msgs waiting ack in shared stan connection,
+        publish waits free place in window
+        :param dedupe: if True, msgs with already received sequence (redelivered duplicates) are not captured and counted
+        :param client_id_prefix: prefix of stan client ids, every connection gets id prefix-uuid4
+        :param serialize_cache_size: max count of protobufs with cached serialized payload, 0 for serialize every send
+        :param serialize_trust_identity: if True, cached payload is used for the same protobuf object without check of
+        its content, don`t change template protobuf after send in this mode
+        :param log_sample_rate: float from 0 to 1, part of sent and received msgs which are logged, set rate of subject
+        with set_log_sample_rate
+        :param log_max_payload: max count of chars of logged msg, longer msgs are truncated, None for unlimited
+        :param log_error_interval: seconds, same handler error is logged not more than once per interval
         """
-        NatsBaseQA.__init__(self, logger, subjects, connect_string, nats_timeout, add_await, msgs_await)
+        NatsBaseQA.__init__(self, logger, subjects, connect_string, nats_timeout, add_await, msgs_await,
+                            use_pool=False, settle_idle=settle_idle, settle_max=settle_max,
+                            capture_store=capture_store, capture_records=capture_records, queue=queue, worker_id=worker_id,
+                            serialize_cache_size=serialize_cache_size, serialize_trust_identity=serialize_trust_identity,
+                            log_sample_rate=log_sample_rate, log_max_payload=log_max_payload,
+                            log_error_interval=log_error_interval)
 
         self._sc = None
         self.global_durable_name = durable_name
         self.cluster_name = cluster_name
+        self.subscribe_concurrency = subscribe_concurrency
+        self.client_id_prefix = client_id_prefix
+        self._listen_args = None
+
+        self.max_pub_in_flight = max_pub_in_flight
+        self._pub_nc, self._pub_sc = None, None
+        self._pub_window, self._pub_waiter = None, None
+        self._pub_pending, self._pub_failed = set(), []
+        self._pub_lost = False
+
+        self._pending_acks, self._ack_batch, self._ack_task = [], 1, None
+
+        self.dedupe = dedupe
+        self._sequences = {}
 
     async def send(self, topic: str, message):
         """
-        nats publish in new nats connection
+        stan publish in shared persistent stan connection, wait ack
+
+        :param topic: stan topic for publish
+        :param message: protobuf class or serialized payload (bytes, bytearray, memoryview)
+        """
+        try:
+            sc = await self._get_stan()
+
+            self._trace.info(topic, "stan {} > {}", topic, message)
+            await sc.publish(topic, self._payload(message, topic))
+        except Exception as e:
+            self._logger.error("stan send error: {}".format(e))
+
+    async def send_many(self, topic_or_pairs, messages=None) -> list:
+        """
+        stan publish of many msgs in shared persistent stan connection
+        all msgs serialized first and published without waiting ack for each one, then wait all acks once
+        msgs share window of publish_async: not more than max_pub_in_flight msgs wait ack
+
+        :param topic_or_pairs: stan topic for all messages or list of (topic, protobuf or bytes) pairs
+        :param messages: list of protobuf classes or bytes, used with single topic
+        :return: list of (index, exception) for failed msgs (publish error, ack error or ack timeout), empty if all msgs sent
+        """
+        payloads, failed = self._serialize_pairs(topic_or_pairs, messages)
+        pending, acked, handlers, waiter, window = set(), set(), {}, None, None
+
+        def ack_handler(index):
+            async def handler(ack):
+                if index in pending:
+                    pending.discard(index)
+                    window.release()
+                acked.add(index)
+                if ack.error:
+                    failed.append((index, StanError(ack.error)))
+                if not pending and waiter and not waiter.done():
+                    waiter.set_result(None)
+            return handler
+
+        try:
+            sc = await self._get_stan()
+            window = self._pub_window
+
+            self._logger.info("stan send_many {} msgs".format(len(payloads)))
+            for index, topic, payload in payloads:
+                try:
+                    await asyncio.wait_for(window.acquire(), self.global_timeout, loop=self._loop)
+                except asyncio.TimeoutError:
+                    failed.append((index, TimeoutError("stan publish window is full, acks don`t come")))
+                    continue
+                pending.add(index)
+                handlers[index] = ack_handler(index)
+                try:
+                    await sc.publish(topic, payload, ack_handler=handlers[index])
+                except Exception as e:
+                    pending.discard(index)
+                    window.release()
+                    failed.append((index, e))
+
+            if pending:
+                waiter = asyncio.Future(loop=self._loop)
+                try:
+                    await asyncio.wait_for(waiter, self.global_timeout, loop=self._loop)
+                except asyncio.TimeoutError:
+                    self._abandon_acks(sc, {handlers[index] for index in pending})
+                    failed.extend((index, TimeoutError("stan ack timeout")) for index in pending)
+                    for _ in pending:
+                        window.release()
+                    pending.clear()
+        except Exception as e:
+            self._logger.error("stan send_many error: {}".format(e))
+            done = {index for index, _ in failed}.union(acked)
+            failed.extend((index, e) for index, _, _ in payloads if index not in done)
+
+        return sorted(failed, key=lambda fail: fail[0])
+
+    async def publish_async(self, topic: str, message):
+        """
+        stan publish in shared persistent stan connection without waiting ack, acks are processed by ack handler
+        not more than max_pub_in_flight msgs wait ack, if window is full wait free place (ack of earlier msg)
+        use flush_acks for wait all acks and get failed msgs, msgs not published (full window, publish error)
+        are reported by flush_acks too
 
-        :param topic: nats topic for publish
-        :param message: protobuf class
+        :param topic: stan topic for publish
+        :param message: protobuf class or serialized payload (bytes, bytearray, memoryview)
         """
         try:
-            nc = Nats()
-            sc = Stan()
+            sc = await self._get_stan()
+            try:
+                await asyncio.wait_for(self._pub_window.acquire(), self.global_timeout, loop=self._loop)
+            except asyncio.TimeoutError:
+                raise TimeoutError("stan publish_async window is full, acks don`t come")
+
+            async def ack_handler(ack):
+                if ack_handler in self._pub_pending:
+                    self._pub_pending.discard(ack_handler)
+                    self._pub_window.release()
+                if ack.error:
+                    self._pub_failed.append((ack.guid, StanError(ack.error)))
+                if not self._pub_pending and self._pub_waiter and not self._pub_waiter.done():
+                    self._pub_waiter.set_result(None)
+
+            self._pub_pending.add(ack_handler)
+            self._trace.info(topic, "stan {} async > {}", topic, message)
+            try:
+                await sc.publish(topic, self._payload(message, topic), ack_handler=ack_handler)
+            except Exception:
+                self._pub_pending.discard(ack_handler)
+                self._pub_window.release()
+                raise
+        except Exception as e:
+            self._pub_failed.append((None, e))
+            self._trace.error("stan publish_async", "stan publish_async error: {}", e)
+
+    async def flush_acks(self, timeout=None) -> list:
+        """
+        wait acks of all publish_async msgs
+        :param timeout: float, seconds, timeout for wait acks, if not set, used global
+        :return: list of (guid, exception) for msgs with ack error or without ack (guid None for not published msgs),
+        empty if all msgs acked
+        """
+        if not timeout:
+            timeout = self.global_timeout
+
+        if self._pub_pending:
+            self._pub_waiter = asyncio.Future(loop=self._loop)
+            try:
+                await asyncio.wait_for(self._pub_waiter, float(timeout), loop=self._loop)
+            except asyncio.TimeoutError:
+                for guid in self._abandon_acks(self._pub_sc, self._pub_pending):
+                    self._pub_failed.append((guid, TimeoutError("stan ack timeout")))
+                for _ in self._pub_pending:
+                    self._pub_window.release()
+                self._pub_pending.clear()
+            finally:
+                self._pub_waiter = None
+
+        failed, self._pub_failed = self._pub_failed, []
+        if failed:
+            self._logger.error("stan flush_acks failed msgs: {}".format(len(failed)))
+        return failed
+
+    @staticmethod
+    def _abandon_acks(sc: Stan, handlers) -> list:
+        """
+        stop waiting acks of msgs: remove their handlers from stan client and take their places from its queue of
+        pending acks, so queue doesn`t grow with acks which never come
+        shared connection is created with unbounded stan queue (window is _pub_window), so extra get of late ack
+        of abandoned msg in stan _process_ack can`t unblock publish beyond window
+        uses private attributes _pub_ack_map and _pending_pub_acks_queue of asyncio-nats-streaming 0.4 (pinned in
+        setup.py), check them on update of stan client
+        :param sc: stan connection
+        :param handlers: collection of ack handlers of abandoned msgs
+        :return: list of guids of abandoned msgs
+        """
+        if sc is None:
+            return []
+        guids = [guid for guid, handler in sc._pub_ack_map.items() if handler in handlers]
+        for guid in guids:
+            del sc._pub_ack_map[guid]
+            try:
+                sc._pending_pub_acks_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        return guids
+
+    def _new_client_id(self) -> str:
+        """
+        :return: unique stan client id, stan server rejects or replaces client with id of connected client
+        """
+        return "{}-{}".format(self.client_id_prefix, uuid.uuid4().hex)
+
+    async def _get_stan(self) -> Stan:
+        """
+        shared persistent stan connection for send, send_many, publish_async, stream and fetch_range
+        created on first use and created again if nats connection is broken or stan server dropped client,
+        msgs of publish_async waiting ack in lost connection are reported by flush_acks as failed
+        :return: stan connection
+        """
+        if self._pub_sc is None or self._pub_lost or not self._pub_nc.is_connected:
+            if self._pub_sc is not None:
+                self._logger.error("stan shared connection is lost, reconnect")
+                self._pub_failed.extend((None, ConnectionError("stan connection lost")) for _ in self._pub_pending)
+                await self._close_stan(self._pub_nc, self._pub_sc)
+
+            nc, sc = Nats(), Stan()
             await nc.connect(io_loop=self._loop, servers=[self.connect_string])
-            await sc.connect(self.cluster_name, str(datetime.datetime.utcnow().microsecond), nats=nc)
+            # in-flight msgs are limited only by _pub_window: stan client window (unbounded queue here) can`t be
+            # corrected after abandoned acks without race with late acks, see _abandon_acks
+            await sc.connect(self.cluster_name, self._new_client_id(), nats=nc, conn_lost_cb=self._pub_conn_lost,
+                             max_pub_acks_inflight=0)
+            self._pub_nc, self._pub_sc, self._pub_lost = nc, sc, False
+            self._pub_window = asyncio.Semaphore(self.max_pub_in_flight, loop=self._loop)
+            self._pub_pending = set()
+        return self._pub_sc
 
-            self._logger.info("stan {} > {}".format(topic, message))
-            await sc.publish(topic, message.SerializeToString())
+    async def _pub_conn_lost(self, error):
+        """
+        stan conn_lost_cb of shared connection, connection is created again on next use
+        :param error: reason of connection lost
+        """
+        self._logger.error("stan shared connection lost: {}".format(error))
+        self._pub_lost = True
 
+    async def _close_stan(self, nc, sc):
+        """
+        close stan and nats connections, errors of already closed stan connection are only logged
+        """
+        try:
             await sc.close()
-            await nc.close()
         except Exception as e:
-            self._logger.error("stan send error: {}".format(e))
+            self._logger.error("stan close error: {}".format(e))
+        await nc.close()
+
+    async def close(self):
+        """
+        finish keep-warm session: unsubscribe all topics, close listener connections and shared stan connection
+        """
+        try:
+            await NatsBaseQA.close(self)
+        finally:
+            pub_nc, pub_sc, self._pub_nc, self._pub_sc = self._pub_nc, self._pub_sc, None, None
+            if pub_sc is not None:
+                await self._close_stan(pub_nc, pub_sc)
 
-    async def start_listen_all(self, durable_name="use global_durable_name"):
+    async def start_listen_all(self, durable_name="use global_durable_name", queue="use global_queue", start_at=None,
+                               sequence=None, time_delta=None, max_inflight=None, ack_wait=None, manual_acks=False,
+                               ack_batch=100, ack_interval=0.1):
         """
         subscribe for list of subjects (passing in init) with _total_handle
+        subscription requests are sent concurrently, not more than subscribe_concurrency in flight
         clear msgs counter, coming in handlers msgs dict and ssids list
         create connect to stan (global for class) only one time, connection can be close only by wait_msgs function
         use wait_msgs function for collect all data coming in nats handler
         :param durable_name: stan subscription durable_name, use default for use global durable name from init
+        :param queue: stan queue group, workers with same queue share msgs, use default for use global queue from init
+        :param start_at: start position of subscription: "new_only", "first", "last_received", "sequence", "time",
+        None for stan default (new_only), don`t set it for durable subscription which already has position
+        :param sequence: int, first sequence for start_at="sequence"
+        :param time_delta: float seconds or timedelta, start from msgs received so much time ago for start_at="time"
+        :param max_inflight: max count of msgs delivered by stan without ack, None for stan default
+        :param ack_wait: seconds, time before stan redelivers msg without ack, None for stan default
+        :param manual_acks: if True, msgs are acked after handler in batches, not one by one by stan client
+        :param ack_batch: count of handled msgs for send acks, not more than max_inflight
+        :param ack_interval: seconds, acks of not full batch are sent after this time
         """
         try:
             if durable_name == "use global_durable_name":
                 durable_name = self.global_durable_name
+            if queue == "use global_queue":
+                queue = self.global_queue
 
-            await NatsBaseQA.start_listen_all(self)
+            if not await NatsBaseQA.start_listen_all(self):
+                return
 
+            self._sequences = {}
             self._sc = Stan()
-            await self._sc.connect(self.cluster_name, str(datetime.datetime.utcnow().microsecond), nats=self._nc)
+            await self._sc.connect(self.cluster_name, self._new_client_id(), nats=self._nc,
+                                   conn_lost_cb=self._listener_conn_lost)
+
+            options = self._subscribe_options(start_at, sequence, time_delta, max_inflight, ack_wait)
+            handler = self._total_handle
+            if self._ack_task is not None:
+                self._ack_task.cancel()
+                self._ack_task = None
+            if manual_acks:
+                self._pending_acks = []
+                self._ack_batch = max(1, min(ack_batch, max_inflight or 1024))
+                self._ack_task = asyncio.ensure_future(self._ack_timer(ack_interval), loop=self._loop)
+                handler = self._total_handle_manual_ack
 
-            for subject in self._subjects:
-                self._subjects[subject] = []
-                ssid = await self._sc.subscribe(subject=subject, cb=self._total_handle,
-                                                durable_name=durable_name, error_cb=self._error_handler)
-                self.ssids.append(ssid)
+            self._listen_args = dict(cb=handler, queue=queue, durable_name=durable_name, error_cb=self._error_handler,
+                                     manual_acks=manual_acks, **options)
+            await self._subscribe_all()
         except Exception as e:
             self._logger.error("stan start_listen error: {}".format(e))
 
-    async def wait_msgs(self, msgs_await=None, timeout=None, add_await=None) -> dict:
+    async def _subscribe_all(self):
+        """
+        subscribe all topics of capture store in listener stan connection with options of last start_listen_all,
+        not more than subscribe_concurrency subscription requests in flight
+        """
+        semaphore = asyncio.Semaphore(self.subscribe_concurrency, loop=self._loop)
+
+        async def subscribe(subject):
+            async with semaphore:
+                return await self._sc.subscribe(subject=subject, **self._listen_args)
+
+        subjects = list(self._capture)
+        subs = await asyncio.gather(*[subscribe(subject) for subject in subjects], loop=self._loop,
+                                    return_exceptions=True)
+        for subject, sub in zip(subjects, subs):
+            if isinstance(sub, Exception):
+                self._logger.error("stan subscribe {} error: {}".format(subject, sub))
+            else:
+                self.ssids.append(sub)
+
+    async def _listener_conn_lost(self, error):
+        """
+        stan conn_lost_cb of listener connection, reconnect and subscribe all topics again
+        (durable subscriptions continue from last acked msg)
+        :param error: reason of connection lost
+        """
+        self._logger.error("stan listener connection lost: {}".format(error))
+        asyncio.ensure_future(self._reconnect_listener(), loop=self._loop)
+
+    async def _reconnect_listener(self, attempts=10, delay=1.0):
+        """
+        create new listener stan connection in listener nats connection and subscribe all topics again
+        nats connection can be reconnecting at this moment, so try again every delay seconds until listener is closed
+        :param attempts: int, max count of attempts, error is logged if listener isn`t reconnected after all of them
+        :param delay: float, seconds between attempts
+        """
+        for attempt in range(1, attempts + 1):
+            nc = self._nc
+            if not nc or nc.is_closed or self._listen_args is None:
+                return
+            if nc.is_connected:
+                try:
+                    self.ssids = []
+                    self._sc = Stan()
+                    await self._sc.connect(self.cluster_name, self._new_client_id(), nats=nc,
+                                           conn_lost_cb=self._listener_conn_lost)
+                    await self._subscribe_all()
+                    self._logger.info("stan listener reconnected, subscriptions: {}".format(len(self.ssids)))
+                    return
+                except Exception as e:
+                    self._logger.error("stan listener reconnect attempt {} error: {}".format(attempt, e))
+            await asyncio.sleep(delay, loop=self._loop)
+        self._logger.error("stan listener isn`t reconnected after {} attempts, msgs aren`t received".format(attempts))
+
+    async def fetch_range(self, channel: str, start_seq: int, end_seq: int, workers=4, timeout=None,
+                          max_inflight=None) -> list:
+        """
+        read historical msgs of channel with sequences from start_seq to end_seq (inclusive) in concurrent workers
+        range is split in workers parts, every worker subscribes from first sequence of its part
+        and unsubscribes after last one
+        msgs are merged in sequence order and added in capture store for channel
+        :param channel: stan topic
+        :param start_seq: int, first sequence
+        :param end_seq: int, last sequence
+        :param workers: int, count of concurrent subscriptions
+        :param timeout: float, seconds, timeout for read all range, if not set, used global
+        :param max_inflight: max count of msgs delivered to every worker without ack, None for stan default
+        :return: list of received items in sequence order, part of range if timeout or error of worker
+        (other workers read their parts to the end), empty list if end_seq < start_seq
+        """
+        if end_seq < start_seq:
+            self._logger.error("stan fetch_range {} empty range: {} - {}".format(channel, start_seq, end_seq))
+            return []
+        if not timeout:
+            timeout = self.global_timeout
+        workers = max(1, min(workers, end_seq - start_seq + 1))
+        step = -(-(end_seq - start_seq + 1) // workers)
+        bounds = [(first, min(first + step - 1, end_seq)) for first in range(start_seq, end_seq + 1, step)]
+        parts = [{} for _ in bounds]
+
+        subs = []
+        try:
+            sc = await self._get_stan()
+
+            async def fetch(part, first, last):
+                done = asyncio.Future(loop=self._loop)
+
+                async def range_handler(msg):
+                    seq = msg.proto.sequence
+                    if first <= seq <= last:
+                        part[seq] = self._capture_item(msg)
+                    if (seq >= last or len(part) == last - first + 1) and not done.done():
+                        done.set_result(None)
+
+                sub = await sc.subscribe(subject=channel, cb=range_handler, error_cb=self._error_handler,
+                                         **self._subscribe_options("sequence", first, max_inflight=max_inflight))
+                subs.append(sub)
+                await done
+                await sub.unsubscribe()
+                subs.remove(sub)
+
+            try:
+                results = await asyncio.wait_for(asyncio.gather(*[fetch(part, first, last)
+                                                                  for part, (first, last) in zip(parts, bounds)],
+                                                                loop=self._loop, return_exceptions=True),
+                                                 float(timeout), loop=self._loop)
+                for (first, last), result in zip(bounds, results):
+                    if isinstance(result, Exception):
+                        self._logger.error("stan fetch_range {} part {} - {} error: {}".format(
+                            channel, first, last, result))
+            except asyncio.TimeoutError:
+                self._logger.error("stan fetch_range {} timeout, got {} of {} msgs".format(
+                    channel, sum(len(part) for part in parts), end_seq - start_seq + 1))
+        except Exception as e:
+            self._logger.error("stan fetch_range error: {}".format(e))
+        finally:
+            for sub in subs:
+                try:
+                    await sub.unsubscribe()
+                except Exception as e:
+                    self._logger.error("stan fetch_range unsubscribe error: {}".format(e))
+
+        items = [part[seq] for part in parts for seq in sorted(part)]
+        if channel not in self._capture:
+            self._capture.add_subject(channel)
+        for item in items:
+            self._store(channel, item)
+        return items
+
+    async def wait_msgs(self, msgs_await=None, timeout=None, add_await=None, settle_idle=None, settle_max=None) -> dict:
         """
         1 wait count msgs in all nats handlers
-        2 wait add_await time
-        3 close all connections, unsubscribe all topics
+        2 wait add_await time (or settle until no new msgs for settle_idle time in settle mode)
+        3 close all connections, unsubscribe all topics (not in keep-warm session)
         4 return dict of all msgs coming in stan handlers
         :param msgs_await: int, wait count msgs in all stan handlers, if not set, used global
         :param timeout: float, seconds, timeout for wait count msgs in all stan handlers, if not set, used global
         :param add_await: float, seconds, wait some more time after receive all msgs_await or timeout, if not set, used global
-        :return: _subjects dict, all received msgs, format {"topic_1": [b'received msg 1', b'received msg 2'], ...}
+        :param settle_idle: float, seconds, settle mode idle window used instead of add_await, if not set, used global
+        :param settle_max: float, seconds, hard cap for settle mode wait, if not set, used global
+        :return: subjects dict, all received msgs, format {"topic_1": [b'received msg 1', b'received msg 2'], ...}
+        """
+        try:
+            await NatsBaseQA.wait_msgs(self, msgs_await, timeout, add_await, settle_idle, settle_max)
+            if not self.keep_alive:
+                await self._close_listener()
+
+            return self.subjects
+        except Exception as e:
+            self._logger.error("stan return_msgs error: {}".format(e))
+
+    @staticmethod
+    def _subscribe_options(start_at=None, sequence=None, time_delta=None, max_inflight=None, ack_wait=None) -> dict:
         """
+        :return: kwargs for stan subscribe, only set options, so stan defaults are used for others
+        """
+        options = {}
+        if start_at is not None:
+            if start_at not in ("new_only", "first", "last_received", "sequence", "time"):
+                raise ValueError("unknown stan start_at: {}".format(start_at))
+            if start_at == "sequence" and sequence is None:
+                raise ValueError("stan start_at sequence needs sequence")
+            if start_at == "time" and time_delta is None:
+                raise ValueError("stan start_at time needs time_delta")
+            options["start_at"] = start_at
+        if sequence is not None:
+            options["sequence"] = sequence
+        if time_delta is not None:
+            if isinstance(time_delta, datetime.timedelta):
+                time_delta = time_delta.total_seconds()
+            options["time"] = time.time() - time_delta
+        if max_inflight is not None:
+            options["max_inflight"] = max_inflight
+        if ack_wait is not None:
+            options["ack_wait"] = ack_wait
+        return options
+
+    async def _total_handle_manual_ack(self, msg):
+        """
+        handler for start_listen_all with manual_acks, msg is acked in batch after _total_handle
+        :param msg: received msg
+        """
+        await self._total_handle(msg)
+        self._pending_acks.append(msg)
+        if len(self._pending_acks) >= self._ack_batch:
+            await self._send_acks()
+
+    async def _send_acks(self):
+        """
+        send acks of all handled msgs, acks are buffered by nats client and flushed in one write
+        """
+        msgs, self._pending_acks = self._pending_acks, []
         try:
-            await NatsBaseQA.wait_msgs(self, msgs_await, timeout, add_await)
+            for msg in msgs:
+                await self._sc.ack(msg)
+        except Exception as e:
+            self._trace.error("stan ack", "stan ack error: {}", e)
 
+    async def _ack_timer(self, interval: float):
+        """
+        send acks of not full batch every interval
+        :param interval: seconds
+        """
+        try:
+            while True:
+                await asyncio.sleep(interval, loop=self._loop)
+                if self._pending_acks:
+                    await self._send_acks()
+        except asyncio.CancelledError:
+            pass
+
+    async def _close_listener(self):
+        """
+        unsubscribe all topics and close stan and nats listener connections
+        """
+        if self._ack_task is not None:
+            self._ack_task.cancel()
+            self._ack_task = None
+        if self._sc:
+            if self._pending_acks:
+                await self._send_acks()
             for ssid in self.ssids:
                 await ssid.unsubscribe()
-
             await self._sc.close()
-            await self._nc.close()
-            self._loop, self._nc, self._sc = None, None, None
+        await self._nc.close()
+        self._loop, self._nc, self._sc = None, None, None
+        self.ssids = []
 
-            return self._subjects
-        except Exception as e:
-            self._logger.error("stan return_msgs error: {}".format(e))
+    def _capture_item(self, msg):
+        """
+        :param msg: received stan msg
+        :return: item for capture store, payload bytes or CapturedMsg if capture_records enabled
+        """
+        if not self.capture_records:
+            return msg.data
+        proto = msg.proto
+        return CapturedMsg(msg.sub.subject, proto.data, "", time.monotonic_ns(), proto.sequence, proto.timestamp,
+                           proto.redelivered, self.worker_id, self.proto_class(msg.sub.subject))
 
     async def _total_handle(self, msg):
         """
-        handler for start_listen_all, collect all msgs in _subjects dict and count them
+        handler for start_listen_all, collect all msgs in capture store and count them
+        :param msg: received msg
+        """
+        try:
+            self._trace.info(msg.sub.subject, "stan got message, topic: {}", msg.sub.subject)
+            if not self._track_sequence(msg) and self.dedupe:
+                return
+            item = self._capture_item(msg)
+            self._store(msg.sub.subject, item)
+            await self._msg_counted(msg.sub.subject, item)
+        except Exception as e:
+            self._trace.error("stan total_handle", "stan total_handle error: {}", e)
+
+    def _track_sequence(self, msg) -> bool:
+        """
         :param msg: received msg
+        :return: True if msg sequence is new in channel, False for duplicate
+        """
+        tracker = self._sequences.get(msg.proto.subject)
+        if tracker is None:
+            tracker = self._sequences[msg.proto.subject] = SequenceTracker()
+        return tracker.add(msg.proto.sequence, msg.proto.redelivered)
+
+    def sequence_report(self, channel=None) -> dict:
+        """
+        :param channel: stan topic, None for report of all channels
+        :return: report of channel (received, duplicates, redelivered, out_of_order, last, missing, gaps)
+        or dict of reports by channel
+        """
+        if channel is not None:
+            tracker = self._sequences.get(channel)
+            return tracker.report() if tracker else SequenceTracker().report()
+        return {channel: tracker.report() for channel, tracker in self._sequences.items()}
+
+    def reset(self):
+        """
+        clear received msgs, msgs counters, expectations and sequence trackers without reconnect
+        """
+        NatsBaseQA.reset(self)
+        self._sequences = {}
+
+    async def _stream_subscribe(self, subject: str, put):
+        """
+        subscribe topic for stream in shared stan connection
+        msg is acked after it is put in stream queue, so stan doesn`t deliver more than max_inflight msgs to slow
+        consumer, with drop_when_full dropped msgs are acked too
+        :param subject: stan topic for subscribe
+        :param put: coroutine function, call it with every received msg
+        :return: stan subscription
+        """
+        sc = await self._get_stan()
+
+        async def stream_handler(msg):
+            await put(self._capture_item(msg))
+
+        return await sc.subscribe(subject=subject, cb=stream_handler, error_cb=self._error_handler)
+
+    async def _stream_unsubscribe(self, subscription):
+        """
+        unsubscribe stream subscription
+        :param subscription: stan subscription from _stream_subscribe
         """
         try:
-            self._logger.info("stan got message, topic: {}".format(msg.sub.subject))
-            self._subjects[msg.sub.subject].append(msg.data)
-            self.total_msg += 1
+            await subscription.unsubscribe()
         except Exception as e:
-            self._logger.error("stan total_handle error: {}".format(e))
+            self._logger.error("stan stream unsubscribe error: {}".format(e))
 
     async def _error_handler(self, msg):
         """
         async callback called on error, with the exception as the sole argument.
         :param msg: received exception msg
         """
-        self._logger.error("nats_base error_handler: {}".format(msg))
+        self._trace.error("nats_base error_handler", "nats_base error_handler: {}", msg)
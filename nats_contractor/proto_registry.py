@@ -0,0 +1,32 @@
+"""
+lazy decoded view of captured msgs, protobuf classes of subjects are kept in SubjectRegistry
+"""
+
+
+class DecodedView:
+    """
+    read-only sequence of decoded protobufs over captured msgs of subject, msg is decoded on first access only
+    """
+
+    def __init__(self, items: list, decode):
+        """
+        :param items: captured items (payload bytes or CapturedMsg)
+        :param decode: callable(item) -> protobuf
+        """
+        self._items = items
+        self._decode = decode
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(item) for item in self._items[index]]
+        return self._decode(self._items[index])
+
+    def __iter__(self):
+        for item in self._items:
+            yield self._decode(item)
+
+    def __repr__(self):
+        return "<DecodedView size={}>".format(len(self._items))
@@ -0,0 +1,109 @@
+"""
+responder for start_listen_with_respond: computes responses with fixed protobuf or handler, collects counters
+"""
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from nats_contractor.serialize_cache import to_payload
+
+THREAD = "thread"
+PROCESS = "process"
+
+
+def make_executor(kind: str, workers=None) -> Executor:
+    """
+    :param kind: THREAD or PROCESS
+    :param workers: int, count of workers, None for default of executor
+    :return: new executor
+    """
+    if kind == THREAD:
+        return ThreadPoolExecutor(max_workers=workers)
+    if kind == PROCESS:
+        return ProcessPoolExecutor(max_workers=workers)
+    raise ValueError("unknown executor kind: {}".format(kind))
+
+
+class ResponderStats:
+    __slots__ = ("received", "responded", "errors", "in_flight", "total_latency", "max_latency", "started")
+
+    def __init__(self):
+        self.received = 0
+        self.responded = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.started = time.monotonic()
+
+    def __repr__(self):
+        return "<ResponderStats {}>".format(self.as_dict())
+
+    @property
+    def throughput(self) -> float:
+        """
+        :return: responses per second since responder start
+        """
+        elapsed = time.monotonic() - self.started
+        return self.responded / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def avg_latency(self) -> float:
+        """
+        :return: seconds, average time from request receive to response publish
+        """
+        return self.total_latency / self.responded if self.responded else 0.0
+
+    def as_dict(self) -> dict:
+        """
+        :return: dict of all counters
+        """
+        return {
+            "received": self.received,
+            "responded": self.responded,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "throughput": self.throughput,
+            "avg_latency": self.avg_latency,
+            "max_latency": self.max_latency,
+        }
+
+
+class Responder:
+
+    def __init__(self, respond_proto=None, handler=None, executor=None, loop=None):
+        """
+        :param respond_proto: protobuf or bytes for all responses, used if handler not set, serialized once
+        :param handler: sync or async callable(request bytes or decoded request) -> response protobuf, bytes
+        or object for codec
+        :param executor: Executor for run sync handler, None for run it in event loop
+        :param loop: asyncio event_loop
+        """
+        if respond_proto is None and handler is None:
+            raise ValueError("responder needs respond_proto or handler")
+
+        self.respond_proto = respond_proto
+        self._respond_payload = to_payload(respond_proto) if respond_proto is not None else None
+        self.handler = handler
+        self.executor = executor
+        self.stats = ResponderStats()
+
+        self._loop = loop
+        self._is_async = asyncio.iscoroutinefunction(handler)
+
+    async def response(self, data: bytes, encode=None) -> bytes:
+        """
+        :param data: request payload or request decoded with codec of subject
+        :param encode: callable(response) -> bytes, codec of subject, None for protobuf serialize
+        :return: response payload
+        """
+        if self.handler is None:
+            return self._respond_payload if encode is None else encode(self.respond_proto)
+        if self._is_async:
+            response = await self.handler(data)
+        elif self.executor is not None:
+            loop = self._loop or asyncio.get_event_loop()
+            response = await loop.run_in_executor(self.executor, self.handler, data)
+        else:
+            response = self.handler(data)
+
+        return to_payload(response) if encode is None else encode(response)
@@ -0,0 +1,115 @@
+"""
+tracker of stan channel sequences: finds duplicates, gaps and out of order delivery
+"""
+from bisect import bisect_right
+
+
+class SequenceTracker:
+    __slots__ = ("low", "high", "_starts", "_ends", "_held", "received", "duplicates", "out_of_order",
+                 "redelivered")
+
+    def __init__(self):
+        """
+        all sequences <= low are received, received sequences above low + 1 are kept as sorted not adjacent
+        intervals (_starts[i], _ends[i]), so memory and time of add depend only on count of gaps, not on count of msgs
+        first received sequence is start of tracking, sequences below it are counted as duplicates
+        """
+        self.low = None
+        self.high = None
+        self._starts = []
+        self._ends = []
+        self._held = 0
+        self.received = 0
+        self.duplicates = 0
+        self.out_of_order = 0
+        self.redelivered = 0
+
+    def __repr__(self):
+        return "<SequenceTracker {}>".format(self.report())
+
+    def add(self, seq: int, redelivered=False) -> bool:
+        """
+        :param seq: stan msg sequence
+        :param redelivered: stan redelivered flag
+        :return: True if sequence is new, False for duplicate
+        """
+        self.received += 1
+        if redelivered:
+            self.redelivered += 1
+
+        if self.low is None:
+            self.low = self.high = seq
+            return True
+
+        if seq <= self.low:
+            self.duplicates += 1
+            return False
+
+        starts, ends = self._starts, self._ends
+        index = bisect_right(starts, seq) - 1
+        if index >= 0 and seq <= ends[index]:
+            self.duplicates += 1
+            return False
+
+        if seq < self.high:
+            self.out_of_order += 1
+        else:
+            self.high = seq
+
+        if seq == self.low + 1:
+            self.low = seq
+            if starts and starts[0] == seq + 1:
+                self.low = ends[0]
+                self._held -= ends[0] - starts[0] + 1
+                del starts[0], ends[0]
+            return True
+
+        self._held += 1
+        joins_left = index >= 0 and ends[index] == seq - 1
+        joins_right = index + 1 < len(starts) and starts[index + 1] == seq + 1
+        if joins_left and joins_right:
+            ends[index] = ends[index + 1]
+            del starts[index + 1], ends[index + 1]
+        elif joins_left:
+            ends[index] = seq
+        elif joins_right:
+            starts[index + 1] = seq
+        else:
+            starts.insert(index + 1, seq)
+            ends.insert(index + 1, seq)
+        return True
+
+    def gaps(self) -> list:
+        """
+        :return: list of (first, last) missed sequences between first and last received sequence
+        """
+        result = []
+        if self.low is None:
+            return result
+        last = self.low
+        for start, end in zip(self._starts, self._ends):
+            result.append((last + 1, start - 1))
+            last = end
+        return result
+
+    def missing(self) -> int:
+        """
+        :return: count of missed sequences
+        """
+        if self.low is None:
+            return 0
+        return self.high - self.low - self._held
+
+    def report(self) -> dict:
+        """
+        :return: dict of counters and gaps
+        """
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "redelivered": self.redelivered,
+            "out_of_order": self.out_of_order,
+            "last": self.high,
+            "missing": self.missing(),
+            "gaps": self.gaps(),
+        }
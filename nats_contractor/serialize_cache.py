@@ -0,0 +1,70 @@
+"""
+lru cache of serialized protobufs for repeated send of the same template msg
+"""
+from collections import OrderedDict
+
+RAW_TYPES = (bytes, bytearray, memoryview)
+
+
+def to_payload(message) -> bytes:
+    """
+    :param message: protobuf or already serialized payload (bytes, bytearray, memoryview)
+    :return: payload bytes
+    """
+    if isinstance(message, bytes):
+        return message
+    if isinstance(message, RAW_TYPES):
+        return bytes(message)
+    return message.SerializeToString()
+
+
+class SerializeCache:
+
+    def __init__(self, max_size=1024, trust_identity=False):
+        """
+        msg is cached by identity, cached payload is used while msg content is equal to snapshot taken on serialize,
+        so changed template is serialized again
+        :param max_size: max count of cached msgs, least recently used msg is evicted
+        :param trust_identity: if True, don`t compare content with snapshot, template must not be changed after first send
+        """
+        self.max_size = max_size
+        self.trust_identity = trust_identity
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def payload(self, message) -> bytes:
+        """
+        :param message: protobuf or already serialized payload
+        :return: payload bytes, from cache if msg wasn`t changed after last serialize
+        """
+        if isinstance(message, RAW_TYPES):
+            return to_payload(message)
+
+        key = id(message)
+        entry = self._data.get(key)
+        if entry is not None and entry[0] is message and (self.trust_identity or entry[1] == message):
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+        self.misses += 1
+        payload = message.SerializeToString()
+        snapshot = None
+        if not self.trust_identity:
+            snapshot = type(message)()
+            snapshot.CopyFrom(message)
+        self._data[key] = message, snapshot, payload
+        self._data.move_to_end(key)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        return payload
+
+    def clear(self):
+        """
+        drop all cached payloads
+        """
+        self._data.clear()
@@ -0,0 +1,153 @@
+"""
+token trie of nats subjects with wildcards, * matches one token, > matches one or more last tokens,
+and registry of values of subject patterns built on it
+"""
+WILDCARD_TOKEN = "*"
+WILDCARD_TAIL = ">"
+
+
+def is_wildcard(subject: str) -> bool:
+    """
+    :param subject: nats subject or pattern
+    :return: True if subject has wildcard tokens
+    """
+    return any(token in (WILDCARD_TOKEN, WILDCARD_TAIL) for token in subject.split("."))
+
+
+def match_subject(pattern: str, subject: str) -> bool:
+    """
+    :param pattern: nats subject, can contains wildcards
+    :param subject: concrete nats subject
+    :return: True if subject matches pattern
+    """
+    if pattern == subject:
+        return True
+    pattern_tokens, tokens = pattern.split("."), subject.split(".")
+    for index, token in enumerate(pattern_tokens):
+        if token == WILDCARD_TAIL:
+            return len(tokens) > index
+        if index >= len(tokens) or (token != WILDCARD_TOKEN and token != tokens[index]):
+            return False
+    return len(tokens) == len(pattern_tokens)
+
+
+class _Node:
+    __slots__ = ("children", "values", "tail_values")
+
+    def __init__(self):
+        self.children = {}
+        self.values = []
+        self.tail_values = []
+
+
+class SubjectTrie:
+
+    def __init__(self, cache_size=10000):
+        """
+        :param cache_size: max count of concrete subjects with cached match result
+        """
+        self._root = _Node()
+        self._cache = {}
+        self.cache_size = cache_size
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, pattern: str, value):
+        """
+        :param pattern: nats subject, can contains wildcards
+        :param value: value returned by match for subjects matched pattern
+        """
+        node = self._root
+        tokens = pattern.split(".")
+        for index, token in enumerate(tokens):
+            if token == WILDCARD_TAIL and index == len(tokens) - 1:
+                node.tail_values.append(value)
+                break
+            node = node.children.setdefault(token, _Node())
+        else:
+            node.values.append(value)
+        self.size += 1
+        self._cache = {}
+
+    def match(self, subject: str) -> tuple:
+        """
+        find values of all patterns matched concrete subject in O(subject tokens), result is cached for subject
+        :param subject: concrete nats subject
+        :return: tuple of values of matched patterns
+        """
+        try:
+            return self._cache[subject]
+        except KeyError:
+            pass
+
+        matched = []
+        tokens = subject.split(".")
+        nodes = [self._root]
+        for index, token in enumerate(tokens):
+            next_nodes = []
+            for node in nodes:
+                matched.extend(node.tail_values)
+                for child in (node.children.get(token), node.children.get(WILDCARD_TOKEN)):
+                    if child is not None:
+                        next_nodes.append(child)
+            nodes = next_nodes
+            if not nodes:
+                break
+        else:
+            for node in nodes:
+                matched.extend(node.values)
+
+        if len(self._cache) >= self.cache_size:
+            self._cache = {}
+        result = self._cache[subject] = tuple(matched)
+        return result
+
+    def clear(self):
+        """
+        remove all patterns
+        """
+        self._root = _Node()
+        self._cache = {}
+        self.size = 0
+
+
+class SubjectRegistry:
+
+    def __init__(self):
+        """
+        values of subject patterns (protobuf classes, codecs, log rates), first registered pattern wins if several
+        patterns match, trie keeps (order of first registration, pattern), so registering the same pattern again
+        replaces its value and keeps its place among other patterns
+        """
+        self._trie = SubjectTrie()
+        self._values = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def register(self, subject: str, value):
+        """
+        :param subject: nats subject, can contains wildcards, first registered pattern wins if several patterns match,
+        value of already registered pattern is replaced
+        :param value: value for msgs of subject
+        """
+        if subject not in self._values:
+            self._trie.insert(subject, (len(self._values), subject))
+        self._values[subject] = value
+
+    def get(self, subject: str):
+        """
+        :param subject: concrete subject
+        :return: value registered for subject or None
+        """
+        matched = self._trie.match(subject)
+        return self._values[min(matched)[1]] if matched else None
+
+    def clear(self):
+        """
+        remove all registered values
+        """
+        self._trie.clear()
+        self._values = {}
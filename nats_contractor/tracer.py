@@ -0,0 +1,110 @@
+"""
+logging of hot paths (send, received msgs, handler errors): level check before formatting, per-subject sampling,
+payload truncation and rate-limited errors
+"""
+import logging
+import time
+from nats_contractor.subject_trie import SubjectRegistry
+from nats_contractor.serialize_cache import RAW_TYPES
+
+
+class Tracer:
+
+    def __init__(self, logger, sample_rate=1.0, max_payload=256, error_interval=1.0):
+        """
+        :param logger: logger class instance
+        :param sample_rate: float from 0 to 1, part of msgs logged for subjects without own rate, 0 for don`t log
+        :param max_payload: max count of chars of every logged argument, longer ones are truncated, None for unlimited
+        :param error_interval: seconds, same error is logged not more than once per interval, others are counted
+        """
+        self._logger = logger
+        self.sample_rate = sample_rate
+        self.max_payload = max_payload
+        self.error_interval = error_interval
+
+        self._rates = SubjectRegistry()
+        self._counters = {}
+        self._errors = {}
+
+    def set_sample_rate(self, subject: str, rate: float):
+        """
+        :param subject: nats subject, can contains wildcards, first registered pattern wins if several patterns match
+        :param rate: float from 0 to 1, part of msgs of subject which are logged, 0 for don`t log
+        """
+        self._rates.register(subject, rate)
+        self._counters = {}
+
+    def enabled(self, level=logging.INFO) -> bool:
+        """
+        :return: True if logger writes records of level
+        """
+        is_enabled_for = getattr(self._logger, "isEnabledFor", None)
+        return is_enabled_for is None or is_enabled_for(level)
+
+    def info(self, subject: str, msg: str, *args):
+        """
+        log info msg of subject, msg is formatted only if info level is enabled and msg is sampled
+        :param subject: topic for sampling
+        :param msg: format string with {} for args
+        :param args: values, converted to str and truncated lazily
+        """
+        if not self.enabled(logging.INFO) or not self._sampled(subject):
+            return
+        self._logger.info(msg.format(*[self._short(arg) for arg in args]))
+
+    def error(self, key: str, msg: str, *args):
+        """
+        log error not more than once per error_interval for key, count of skipped errors is added in next record,
+        use flush for log counts of errors skipped after last record
+        :param key: kind of error, example "nats total_handle"
+        :param msg: format string with {} for args
+        :param args: values, converted to str and truncated lazily
+        """
+        now = time.monotonic()
+        last, skipped = self._errors.get(key, (None, 0))
+        if last is not None and now - last < self.error_interval:
+            self._errors[key] = last, skipped + 1
+            return
+        self._errors[key] = now, 0
+        text = msg.format(*[self._short(arg) for arg in args])
+        if skipped:
+            text = "{} (same errors skipped: {})".format(text, skipped)
+        self._logger.error(text)
+
+    def flush(self):
+        """
+        log counts of errors skipped after last record of every key
+        """
+        errors, self._errors = self._errors, {}
+        for key, (_, skipped) in errors.items():
+            if skipped:
+                self._logger.error("{} errors skipped: {}".format(key, skipped))
+
+    def _sampled(self, subject: str) -> bool:
+        """
+        deterministic sampling: msg is logged when count * rate passes next integer,
+        so with rate 0.01 every 100th msg of subject is logged and with rate 0.75 three of every four
+        """
+        rate = self._rates.get(subject) if len(self._rates) else None
+        if rate is None:
+            rate = self.sample_rate
+        if rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        count = self._counters.get(subject, 0)
+        self._counters[subject] = count + 1
+        return int(count * rate) != int((count + 1) * rate)
+
+    def _short(self, value) -> str:
+        """
+        :return: str of value not longer than max_payload, bytes are cut before conversion
+        """
+        limit = self.max_payload
+        if limit is None:
+            return str(value)
+        if isinstance(value, RAW_TYPES):
+            text = repr(bytes(value[:limit]))
+            return text if len(value) <= limit else "{}...({} bytes)".format(text, len(value))
+        text = str(value)
+        return text if len(text) <= limit else "{}...({} chars)".format(text[:limit], len(text))
@@ -8,6 +8,11 @@ setup(
     ],
     install_requires=[
         'asyncio-nats-client',
-        'asyncio-nats-streaming',
-    ]
+        # nats_streaming._abandon_acks uses private attributes of stan client 0.4
+        'asyncio-nats-streaming>=0.4.0,<0.5',
+    ],
+    extras_require={
+        'msgpack': ['msgpack'],
+        'lz4': ['lz4'],
+    }
 )